@@ -0,0 +1,55 @@
+"""Full-text product search: generated tsvector column with a GIN index
+
+Revision ID: 0c6e9a2f7b18
+Revises: f2b8d4a6c1e3
+Create Date: 2026-10-17 16:02:54.771930
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0c6e9a2f7b18"
+down_revision: Union[str, None] = "f2b8d4a6c1e3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Adding a stored generated column rewrites the table under an exclusive
+    # lock; run it in a quiet window on large catalogs.
+    op.execute(
+        "ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(product_name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED"
+    )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_search_vector",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.create_index(
+            "ix_products_search_vector",
+            "products",
+            ["search_vector"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_search_vector",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column("products", "search_vector")
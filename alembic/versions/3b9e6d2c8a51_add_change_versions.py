@@ -0,0 +1,34 @@
+"""Add change version counters for ETags
+
+Revision ID: 3b9e6d2c8a51
+Revises: 7a1d5c3e9f62
+Create Date: 2026-10-17 18:12:40.551927
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9e6d2c8a51"
+down_revision: Union[str, None] = "7a1d5c3e9f62"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "change_versions",
+        sa.Column("scope", sa.String(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("scope"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("change_versions")
@@ -0,0 +1,52 @@
+"""Trigram index on product names for fuzzy search
+
+Revision ID: 7a1d5c3e9f62
+Revises: 0c6e9a2f7b18
+Create Date: 2026-10-17 16:48:19.204563
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7a1d5c3e9f62"
+down_revision: Union[str, None] = "0c6e9a2f7b18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_live_name_trgm",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.create_index(
+            "ix_products_live_name_trgm",
+            "products",
+            ["product_name"],
+            postgresql_using="gin",
+            postgresql_ops={"product_name": "gin_trgm_ops"},
+            postgresql_concurrently=True,
+            postgresql_where=sa.text("deleted_at IS NULL"),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The extension stays; other objects may use it.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_live_name_trgm",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
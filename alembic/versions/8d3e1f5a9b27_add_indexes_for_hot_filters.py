@@ -0,0 +1,83 @@
+"""Add indexes and unique constraints for the hot filters
+
+Revision ID: 8d3e1f5a9b27
+Revises: 342beee6c255
+Create Date: 2026-10-17 10:12:41.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d3e1f5a9b27"
+down_revision: Union[str, None] = "342beee6c255"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns, unique). The unique indexes back the
+# constraints of the same name; (owner_id, product_name) also serves the
+# lookups by owner_id alone.
+INDEXES = [
+    (
+        "uq_products_owner_id_product_name",
+        "products",
+        ["owner_id", "product_name"],
+        True,
+    ),
+    ("ix_products_price", "products", ["price"], False),
+    ("uq_carts_owner_id_product_id", "carts", ["owner_id", "product_id"], True),
+    ("ix_orders_owner_id", "orders", ["owner_id"], False),
+    ("ix_orders_product_id", "orders", ["product_id"], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and it does
+    # not block writes while the index is built. A build that fails (e.g. on
+    # duplicate rows for a unique index) leaves an INVALID index behind, so
+    # any leftover is dropped first and the migration can simply be re-run.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+            )
+
+    # Promoting a unique index to a constraint only takes a brief lock.
+    if op.get_bind().dialect.name == "postgresql":
+        for name, table, columns, unique in INDEXES:
+            if unique:
+                op.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}"
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "postgresql":
+        for name, table, columns, unique in INDEXES:
+            if unique:
+                op.drop_constraint(name, table, type_="unique")
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,122 @@
+"""Soft-delete products with partial catalog indexes
+
+Revision ID: b41c7e92d0a6
+Revises: 8d3e1f5a9b27
+Create Date: 2026-10-17 12:40:05.533917
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b41c7e92d0a6"
+down_revision: Union[str, None] = "8d3e1f5a9b27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = sa.text("deleted_at IS NULL")
+DELETED = sa.text("deleted_at IS NOT NULL")
+
+# (index name, columns, unique, where). The full (owner_id, product_name)
+# index served the lookups and cascades by owner_id; the partial one does
+# not cover deleted rows, so owner_id gets an index of its own.
+INDEXES = [
+    ("ix_products_owner_id", ["owner_id"], False, None),
+    (
+        "uq_products_live_owner_id_product_name",
+        ["owner_id", "product_name"],
+        True,
+        LIVE,
+    ),
+    ("ix_products_live_price", ["price"], False, LIVE),
+    ("ix_products_deleted_at", ["deleted_at"], False, DELETED),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "products", sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True)
+    )
+
+    # The new indexes are built next to the full ones, so the catalog
+    # queries always have an index to use.
+    with op.get_context().autocommit_block():
+        for name, columns, unique, where in INDEXES:
+            op.drop_index(
+                name,
+                table_name="products",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+            op.create_index(
+                name,
+                "products",
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                postgresql_where=where,
+            )
+
+    # A seller may reuse the name of a deleted product, so the full unique
+    # constraint goes; the partial unique index enforces it for live rows.
+    if op.get_bind().dialect.name == "postgresql":
+        op.drop_constraint(
+            "uq_products_owner_id_product_name", "products", type_="unique"
+        )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "uq_products_owner_id_product_name",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_products_price",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Soft-deleted products are purged first: the full unique constraint
+    # would reject a deleted product that shares its name with a live one.
+    deleted = "SELECT id FROM products WHERE deleted_at IS NOT NULL"
+    op.execute(f"DELETE FROM carts WHERE product_id IN ({deleted})")
+    op.execute(f"UPDATE orders SET product_id = NULL WHERE product_id IN ({deleted})")
+    op.execute("DELETE FROM products WHERE deleted_at IS NOT NULL")
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "uq_products_owner_id_product_name",
+            "products",
+            ["owner_id", "product_name"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_products_price",
+            "products",
+            ["price"],
+            postgresql_concurrently=True,
+        )
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "ALTER TABLE products ADD CONSTRAINT uq_products_owner_id_product_name "
+            "UNIQUE USING INDEX uq_products_owner_id_product_name"
+        )
+    with op.get_context().autocommit_block():
+        for name, columns, unique, where in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name="products",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column("products", "deleted_at")
@@ -0,0 +1,65 @@
+"""Index the catalog by (price, id) for cursor pagination
+
+Revision ID: f2b8d4a6c1e3
+Revises: e5a7c3d91f40
+Create Date: 2026-10-17 15:20:37.904615
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f2b8d4a6c1e3"
+down_revision: Union[str, None] = "e5a7c3d91f40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = sa.text("deleted_at IS NULL")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The (price, id) index also serves every query on price alone.
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_products_live_price_id",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.create_index(
+            "ix_products_live_price_id",
+            "products",
+            ["price", "id"],
+            postgresql_concurrently=True,
+            postgresql_where=LIVE,
+        )
+        op.drop_index(
+            "ix_products_live_price",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_products_live_price",
+            "products",
+            ["price"],
+            postgresql_concurrently=True,
+            postgresql_where=LIVE,
+            if_not_exists=True,
+        )
+        op.drop_index(
+            "ix_products_live_price_id",
+            table_name="products",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -1 +1 @@
-from app.core.database import Base, get_db
+from app.core.database import Base, get_db, get_async_db
@@ -0,0 +1,324 @@
+from app.models import carts, users, products, orders
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.core.database import async_engine, shard_engines
+from app.core.etag import bump_statement
+from app.core.sharding import SHARD_COUNT, next_shard_id, shard_for_owner
+from app.core.suggest import suggest_index
+from app.schemas.product_schema import ProductDetails
+from pydantic import ValidationError
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table
+from sqlalchemy import exists, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from itertools import islice
+from typing import Iterable, Iterator
+import asyncio
+import csv
+import json
+import os
+import sys
+
+"""
+Bulk import of a seller's products from CSV or NDJSON.
+
+The file is read line by line and validated with ProductDetails in chunks of
+PRODUCT_IMPORT_CHUNK_ROWS rows, in a worker thread. Valid rows are loaded into a temporary
+staging table, through COPY on PostgreSQL, on the database (shard) of the
+seller. The whole import is then checked for duplicates and merged into the
+products with two set-based statements. Rows whose name repeats an earlier
+row, or a live product of the seller, are reported and skipped. CSV files
+need a header naming the columns product_name, price, stock and,
+optionally, description; NDJSON lines are objects with the same keys.
+
+    python -m app.core.bulk_import <owner_id> <file.csv|file.ndjson>
+"""
+
+IMPORT_CHUNK_ROWS = int(os.getenv("PRODUCT_IMPORT_CHUNK_ROWS", "5000"))
+# Errors listed in the report; the count of rejected rows is always exact.
+IMPORT_MAX_ERRORS = int(os.getenv("PRODUCT_IMPORT_MAX_ERRORS", "1000"))
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+staging = Table(
+    "product_import",
+    MetaData(),
+    Column("row_number", Integer, nullable=False),
+    Column("product_name", String, nullable=False),
+    Column("price", Float, nullable=False),
+    Column("stock", Integer, nullable=False),
+    Column("description", String),
+    prefixes=["TEMPORARY"],
+)
+STAGING_COLUMNS = [column.name for column in staging.columns]
+
+
+def import_format(filename: str | None) -> str | None:
+    """Return "csv" or "ndjson" from a file name, or None if unsupported."""
+    return IMPORT_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def parse_rows(lines: Iterable[str], file_format: str) -> Iterator[tuple]:
+    """
+    Yield (row number, record, error) for each row of the file.
+
+    Rows are numbered by their line in the file. The record is a dict of
+    the row's fields, or None with an error when the line cannot be parsed.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield line_number, None, "Invalid JSON."
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object."
+            continue
+        yield line_number, record, None
+
+
+def validate_row(record: dict) -> tuple[ProductDetails | None, str | None]:
+    """
+    Validate a row like POST /products/add validates its fields.
+
+    Returns:
+        tuple: The product details, or None and the reason the row is rejected.
+    """
+    try:
+        details = ProductDetails(
+            product_name=record.get("product_name"),
+            price=record.get("price"),
+            stock=record.get("stock"),
+            description=record.get("description") or None,
+        )
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        )
+    if not details.product_name or details.price <= 0 or details.stock <= 0:
+        return None, "Invalid details or Details are missing."
+    return details, None
+
+
+def read_chunk(rows: Iterator[tuple], size: int) -> tuple[int, list, list]:
+    """
+    Read and validate the next `size` rows of a file.
+
+    Runs in a worker thread, since reading the upload and validating the
+    rows would otherwise block the event loop.
+
+    Args:
+        rows (Iterator[tuple]): The rows from parse_rows.
+        size (int): The number of rows to read.
+
+    Returns:
+        tuple: The number of rows read, the staging rows of the valid ones
+        and (row number, error) for the rejected ones.
+    """
+    read, valid, rejected = 0, [], []
+    for row_number, record, error in islice(rows, size):
+        read += 1
+        details = None
+        if record is not None:
+            details, error = validate_row(record)
+        if details is None:
+            rejected.append((row_number, error))
+            continue
+        valid.append(
+            (
+                row_number,
+                details.product_name,
+                details.price,
+                details.stock,
+                details.description,
+            )
+        )
+    return read, valid, rejected
+
+
+async def copy_rows(conn: AsyncConnection, rows: list[tuple]) -> None:
+    """Load a chunk of validated rows into the staging table."""
+    if conn.dialect.name == "postgresql":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            staging.name, records=rows, columns=STAGING_COLUMNS
+        )
+    else:
+        await conn.execute(
+            staging.insert(), [dict(zip(STAGING_COLUMNS, row)) for row in rows]
+        )
+
+
+def merge_statements(
+    dialect_name: str, owner_id: int, first_id: int | None = None
+) -> tuple:
+    """
+    Build the duplicate report and the merge of the staging table.
+
+    A row is merged when it is the first with its name in the file and the
+    seller has no live product of that name. The report lists every other
+    row. ON CONFLICT skips names another request added in the meantime.
+
+    Args:
+        dialect_name (str): The dialect of the seller's shard.
+        owner_id (int): The seller the products are added for.
+        first_id (int | None): The first id to give the new products, every
+            SHARD_COUNT-th id after it; None lets the id sequence pick them.
+
+    Returns:
+        tuple: The duplicate report select and the products insert, which
+        returns the id and name of each new product.
+    """
+    first_rows = select(func.min(staging.c.row_number)).group_by(staging.c.product_name)
+    existing = exists().where(
+        ProductModel.owner_id == owner_id,
+        ProductModel.product_name == staging.c.product_name,
+        ProductModel.deleted_at.is_(None),
+    )
+    duplicates = (
+        select(staging.c.row_number, existing.label("existing"))
+        .where(or_(existing, staging.c.row_number.not_in(first_rows)))
+        .order_by(staging.c.row_number)
+    )
+    columns = ["product_name", "price", "stock", "description", "owner_id"]
+    values = [
+        staging.c.product_name,
+        staging.c.price,
+        staging.c.stock,
+        staging.c.description,
+        literal(owner_id),
+    ]
+    if first_id is not None:
+        position = func.row_number().over(order_by=staging.c.row_number) - 1
+        columns.append("id")
+        values.append(literal(first_id) + position * SHARD_COUNT)
+    new_rows = select(*values).where(staging.c.row_number.in_(first_rows), ~existing)
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    merge = (
+        insert(ProductModel.__table__)
+        .from_select(columns, new_rows)
+        .on_conflict_do_nothing(
+            index_elements=["owner_id", "product_name"],
+            index_where=ProductModel.deleted_at.is_(None),
+        )
+        .returning(ProductModel.id, ProductModel.product_name)
+    )
+    return duplicates, merge
+
+
+async def import_products(
+    owner_id: int, lines: Iterable[str], file_format: str
+) -> dict:
+    """
+    Import a seller's products from the lines of a CSV or NDJSON file.
+
+    The import is one transaction: either all valid, new rows are added or,
+    if the database fails, none. The new products are added to this
+    process's suggest index; other workers pick them up on their refresh.
+
+    Args:
+        owner_id (int): The seller the products are added for.
+        lines (Iterable[str]): The lines of the file, read lazily.
+        file_format (str): "csv" or "ndjson".
+
+    Returns:
+        dict: The number of rows read, inserted and rejected, and up to
+        IMPORT_MAX_ERRORS rejected rows with the reason, by row number.
+    """
+    errors = []
+    read = 0
+
+    def reject(row_number: int, error: str) -> None:
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": row_number, "error": error})
+
+    shard_id = shard_for_owner(owner_id)
+    engine = shard_engines[shard_id]
+    async with engine.begin() as conn:
+        # SQLite commits DDL at once, so a failed import can leave the table.
+        await conn.run_sync(staging.drop, checkfirst=True)
+        await conn.run_sync(staging.create)
+        rows = parse_rows(lines, file_format)
+        while True:
+            count, chunk, rejected = await asyncio.to_thread(
+                read_chunk, rows, IMPORT_CHUNK_ROWS
+            )
+            if not count:
+                break
+            read += count
+            for row_number, error in rejected:
+                reject(row_number, error)
+            if chunk:
+                await copy_rows(conn, chunk)
+
+        first_id = None
+        if conn.dialect.name != "postgresql":
+            # Only PostgreSQL interleaves ids across shards with its sequences.
+            max_id = await conn.scalar(select(func.max(ProductModel.id)))
+            first_id = next_shard_id(max_id, shard_id)
+        duplicates, merge = merge_statements(conn.dialect.name, owner_id, first_id)
+        for row in await conn.execute(duplicates):
+            reject(
+                row.row_number,
+                (
+                    "Product Already Exists with this name."
+                    if row.existing
+                    else "Product name repeats an earlier row."
+                ),
+            )
+        products = (await conn.execute(merge)).all()
+        await conn.run_sync(staging.drop)
+    inserted = len(products)
+    if inserted:
+        async with async_engine.begin() as conn:
+            await conn.execute(bump_statement(conn.dialect.name, {"products"}))
+        suggest_index.add_many(products)
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "read": read,
+        "inserted": inserted,
+        # Rows lost to a concurrent insert of the same name are counted too.
+        "rejected": read - inserted,
+        "errors": errors,
+    }
+
+
+def run():
+    if len(sys.argv) != 3:
+        print("Usage: python -m app.core.bulk_import <owner_id> <file>")
+        sys.exit(2)
+    owner_id, path = int(sys.argv[1]), sys.argv[2]
+    file_format = import_format(path)
+    if file_format is None:
+        print(f"Unsupported file type; use one of {', '.join(IMPORT_FORMATS)}.")
+        sys.exit(2)
+
+    async def main():
+        try:
+            async with async_engine.connect() as conn:
+                role = await conn.scalar(
+                    select(UserModel.role).where(UserModel.id == owner_id)
+                )
+            if role != "admin":
+                print(f"User {owner_id} is not an admin.")
+                sys.exit(1)
+            with open(path, encoding="utf-8", newline="") as lines:
+                return await import_products(owner_id, lines, file_format)
+        finally:
+            for engine in shard_engines.values():
+                await engine.dispose()
+
+    report = asyncio.run(main())
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    run()
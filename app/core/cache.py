@@ -0,0 +1,209 @@
+# Process-wide LRU caches with time-to-live and commit-time invalidation
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "50000"))
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", "2000"))
+LISTING_CACHE_TTL = float(os.getenv("LISTING_CACHE_TTL", "10"))
+LISTING_CACHE_MAX_BYTES = int(os.getenv("LISTING_CACHE_MAX_BYTES", str(32 << 20)))
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    The least recently used entry is evicted once `maxsize` entries are held,
+    or once the sizes given to `set()` add up to more than `maxbytes`.
+    Hits, misses, evictions and invalidations are counted for `stats()`.
+    """
+
+    def __init__(
+        self, name: str, maxsize: int, ttl: float, maxbytes: int | None = None
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default=None):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is MISSING or entry[0] <= time.monotonic():
+                if entry is not MISSING:
+                    self._pop(key)
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(
+        self, key: Hashable, value: Any, ttl: float | None = None, size: int = 0
+    ) -> None:
+        if self.maxsize <= 0 or (self.maxbytes is not None and size > self.maxbytes):
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self._pop(key)
+            self.entries[key] = (expires, value, size)
+            self.bytes += size
+            while len(self.entries) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes
+            ):
+                self._pop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _pop(self, key: Hashable):
+        entry = self.entries.pop(key, MISSING)
+        if entry is not MISSING:
+            self.bytes -= entry[2]
+        return entry
+
+    def invalidate(self, key: Hashable) -> None:
+        with self.lock:
+            if self._pop(key) is not MISSING:
+                self.invalidations += 1
+
+    def invalidate_where(self, predicate) -> None:
+        """Drop every entry whose value satisfies `predicate(value)`."""
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if predicate(e[1])]:
+                self._pop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "bytes": self.bytes,
+                "maxbytes": self.maxbytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class ListingPage(NamedTuple):
+    """A serialized catalog page and what it depends on."""
+
+    body: bytes
+    next_cursor: str | None
+    product_ids: frozenset
+    min_price: float | None
+    max_price: float | None
+    # The validator headers of the catalog version the page was built at.
+    headers: dict | None = None
+
+    def covers_price(self, price: float) -> bool:
+        return (self.min_price is None or price >= self.min_price) and (
+            self.max_price is None or price <= self.max_price
+        )
+
+
+class ListingCache(TTLCache):
+    """
+    Catalog pages, invalidated by what changed rather than by page key.
+
+    `invalidate()` takes ("product", id) for a change that leaves the
+    product where it is in every listing, e.g. its stock, dropping the pages
+    that show it; ("price", price) for a product appearing, disappearing or
+    moving at that price, dropping the pages whose price filter admits it;
+    or ("all",).
+    """
+
+    def invalidate(self, key: Hashable) -> None:
+        if key[0] == "product":
+            self.invalidate_where(lambda page: key[1] in page.product_ids)
+        elif key[0] == "price":
+            self.invalidate_where(lambda page: page.covers_price(key[1]))
+        else:
+            self.invalidate_where(lambda page: True)
+
+
+product_cache = TTLCache("products", PRODUCT_CACHE_SIZE, PRODUCT_CACHE_TTL)
+user_cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL)
+# Verified access token claims; each entry expires with its token.
+token_cache = TTLCache("tokens", TOKEN_CACHE_SIZE, 0)
+listing_cache = ListingCache(
+    "listings", LISTING_CACHE_SIZE, LISTING_CACHE_TTL, LISTING_CACHE_MAX_BYTES
+)
+caches: list[TTLCache] = [product_cache, user_cache, token_cache, listing_cache]
+
+
+def invalidate_on_commit(session: Session | None, cache: TTLCache, key: Hashable):
+    """
+    Drop a cache entry now and again when the session's transaction ends.
+
+    The first invalidation stops this worker from serving the old row; the
+    second removes any copy another request cached from the database before
+    the change was committed.
+
+    Args:
+        session (Session | None): The session making the change.
+        cache (TTLCache): The cache holding the entry.
+        key (Hashable): The cache key.
+    """
+    cache.invalidate(key)
+    if session is not None:
+        session.info.setdefault("cache_invalidations", set()).add((cache.name, key))
+
+
+def invalidate_listings(
+    session: Session | None, product_id: int, prices: tuple = ()
+) -> None:
+    """
+    Drop the cached catalog pages a product change can affect, now and
+    when the session's transaction ends.
+
+    Args:
+        session (Session | None): The session making the change.
+        product_id (int): The product changed.
+        prices (tuple): The prices the product is (re)placed at or removed
+                        from, when it appears in, leaves or moves within the
+                        listings; empty when only its shown fields change.
+    """
+    invalidate_on_commit(session, listing_cache, ("product", product_id))
+    for price in prices:
+        invalidate_on_commit(session, listing_cache, ("price", price))
+
+
+def cache_stats() -> dict:
+    """Return the counters of every cache, keyed by cache name."""
+    return {cache.name: cache.stats() for cache in caches}
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def invalidate_after_transaction(session) -> None:
+    """AFTER COMMIT / ROLLBACK EVENT"""
+    by_name = {cache.name: cache for cache in caches}
+    for name, key in session.info.pop("cache_invalidations", ()):
+        by_name[name].invalidate(key)
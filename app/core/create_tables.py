@@ -1,17 +1,24 @@
-from app.models import carts, users, products, orders
-from app.core.database import Base, engine
+from app.models import carts, users, products, orders, revoked_tokens, change_versions
+from app.core.database import Base, engine, shard_sync_engines
+from app.core.sharding import SHARDING_ENABLED, HOME_SHARD, prepare_shards
 import sys
 
 """
 This script initializes the database by creating all tables
 defined in SQLAlchemy models (carts, users, products, orders).
 Run this before starting the application for the first time.
+With DATABASE_SHARD_URLS set it also prepares the product/order shards.
 """
 
 
 def run():
     try:
         Base.metadata.create_all(bind=engine)
+        if SHARDING_ENABLED:
+            prepare_shards(
+                Base.metadata,
+                {HOME_SHARD: engine, **shard_sync_engines},
+            )
         print("All tables created successfully!")
     except Exception as e:
         print(f"Error creating tables: {e}")
@@ -0,0 +1,192 @@
+# Version stamps and conditional GET for catalog, cart and order reads
+"""
+Every commit that changes products, carts or orders bumps counters in the
+change_versions table: "products" for the catalog, "cart:<user id>" and
+"orders:<user id>" for one user's cart and orders, and "carts" / "orders"
+for set-based statements that may touch any user's rows. Reads build a
+strong ETag from their counters with one primary-key lookup, and answer a
+matching If-None-Match with 304 before running their query.
+
+The counters are bumped in their own short transaction after the change
+has committed, so the counter row is never locked for the length of a
+checkout. A reader that sees the new counter therefore also sees the
+change; one that pairs the old counter with the new data only costs its
+client one more full response. If a bump fails, its scopes are retried with
+the next bump and until then their reads carry no ETag, so no client is
+told that changed data is still current.
+"""
+from fastapi import Request, Response
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+from app.models.carts import CartModel
+from app.models.change_versions import ChangeVersionModel
+from app.models.orders import OrderModel
+from app.models.products import ProductModel
+from app.models.users import UserModel
+
+# The catalog may be stored by shared caches; carts and orders only by the
+# user's browser, which must not reuse them for another login.
+PUBLIC_CACHE_CONTROL = "public, no-cache"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+# Sent instead of the validators while a scope's counter is behind.
+NO_STORE_CACHE_CONTROL = "no-store"
+
+CATALOG_SCOPES = ("products",)
+# Scopes whose bump failed in this worker, retried with the next bump.
+unbumped_scopes: set[str] = set()
+
+
+def cart_scopes(user_id: int) -> tuple:
+    # The cart shows product names and prices.
+    return ("products", "carts", f"cart:{user_id}")
+
+
+def order_scopes(user_id: int) -> tuple:
+    return ("orders", f"orders:{user_id}")
+
+
+async def cache_headers(db: AsyncSession, scopes: tuple, private: bool = False) -> dict:
+    """
+    Build the validator headers of a read from its change counters.
+
+    Args:
+        db (AsyncSession): The database session.
+        scopes (tuple): The counters the response depends on.
+        private (bool): Whether the response belongs to the logged-in user.
+
+    Returns:
+        dict: The ETag, Cache-Control and, for private responses, Vary headers;
+        only Cache-Control: no-store while a bump of the scopes has failed.
+    """
+    if unbumped_scopes.intersection(scopes):
+        return {"Cache-Control": NO_STORE_CACHE_CONTROL}
+    result = await db.execute(
+        select(ChangeVersionModel.scope, ChangeVersionModel.version).where(
+            ChangeVersionModel.scope.in_(scopes)
+        )
+    )
+    versions = dict(result.all())
+    etag = "/".join(f"{scope}@{versions.get(scope, 0)}" for scope in scopes)
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": PRIVATE_CACHE_CONTROL if private else PUBLIC_CACHE_CONTROL,
+    }
+    if private:
+        headers["Vary"] = "Cookie"
+    return headers
+
+
+def not_modified(request: Request, headers: dict) -> Response | None:
+    """
+    Return a 304 response if the client already holds the current version.
+
+    Args:
+        request (Request): The incoming request.
+        headers (dict): The headers from `cache_headers`.
+
+    Returns:
+        Response | None: A 304 carrying `headers`, or None when the full
+        response has to be sent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match or "ETag" not in headers:
+        return None
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in tags or headers["ETag"] in tags:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+def bump_statement(dialect_name: str, scopes):
+    """Return the upsert adding one to each counter, creating the missing ones."""
+    table = ChangeVersionModel.__table__
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    # A fixed order keeps concurrent bumps from deadlocking.
+    statement = insert(table).values(
+        [{"scope": scope, "version": 1} for scope in sorted(scopes)]
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.scope], set_={"version": table.c.version + 1}
+    )
+
+
+def bump_versions(bind, scopes) -> None:
+    with bind.begin() as conn:
+        conn.execute(bump_statement(bind.dialect.name, scopes))
+
+
+def queue_scopes(session: Session | None, *scopes: str) -> None:
+    if session is not None:
+        session.info.setdefault("changed_scopes", set()).update(scopes)
+
+
+@event.listens_for(ProductModel, "after_insert")
+@event.listens_for(ProductModel, "after_update")
+@event.listens_for(ProductModel, "after_delete")
+@event.listens_for(UserModel, "after_delete")
+def product_changed(mapper, connection, target) -> None:
+    """AFTER INSERT / UPDATE / DELETE EVENT"""
+    # Deleting a seller deletes their products in the database.
+    queue_scopes(object_session(target), "products")
+
+
+@event.listens_for(CartModel, "after_insert")
+@event.listens_for(CartModel, "after_update")
+@event.listens_for(CartModel, "after_delete")
+def cart_changed(mapper, connection, target) -> None:
+    """AFTER INSERT / UPDATE / DELETE EVENT"""
+    queue_scopes(object_session(target), f"cart:{target.owner_id}")
+
+
+@event.listens_for(OrderModel, "after_insert")
+@event.listens_for(OrderModel, "after_update")
+@event.listens_for(OrderModel, "after_delete")
+def order_changed(mapper, connection, target) -> None:
+    """AFTER INSERT / UPDATE / DELETE EVENT"""
+    # Placing and cancelling orders changes the product's stock.
+    queue_scopes(object_session(target), "products", f"orders:{target.owner_id}")
+
+
+# Set-based statements can touch any user's rows.
+BULK_SCOPES = ("products", "carts", "orders")
+
+
+@event.listens_for(Session, "do_orm_execute")
+def bulk_changed(orm_execute_state) -> None:
+    """ORM EXECUTE EVENT"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        queue_scopes(
+            orm_execute_state.session,
+            *(
+                mapper.local_table.name
+                for mapper in orm_execute_state.all_mappers
+                if mapper.local_table.name in BULK_SCOPES
+            ),
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def bump_after_commit(session) -> None:
+    """AFTER COMMIT EVENT"""
+    scopes = session.info.pop("changed_scopes", None)
+    if not scopes:
+        return
+    scopes = scopes | unbumped_scopes
+    try:
+        bump_versions(session.get_bind(mapper=inspect(ChangeVersionModel)), scopes)
+    except Exception as e:
+        # Until a bump succeeds, reads of these scopes go out without ETag.
+        unbumped_scopes.update(scopes)
+        print(f"Change version bump failed for {', '.join(sorted(scopes))}: {e}")
+        return
+    unbumped_scopes.difference_update(scopes)
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_scopes(session) -> None:
+    """AFTER ROLLBACK EVENT"""
+    session.info.pop("changed_scopes", None)
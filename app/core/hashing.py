@@ -0,0 +1,122 @@
+# Bounded bcrypt worker pool and work factor calibration
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+# Every login hashes once, so the cost is a latency/CPU budget per login.
+# Pick it per machine with `python -m app.core.hashing`.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+BCRYPT_QUEUE = int(os.getenv("BCRYPT_QUEUE", "16"))
+BCRYPT_RETRY_AFTER = os.getenv("BCRYPT_RETRY_AFTER", "1")
+
+# Hashes with any other cost are rehashed on the next successful login,
+# whether the cost went up or down.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+class HashingPool:
+    """
+    Dedicated threads for bcrypt with a hard limit on queued work.
+
+    bcrypt releases the GIL, so the hashes run in parallel with the request
+    threads. At most `workers + queue` calls are admitted; the rest are
+    refused with 503 right away instead of occupying more request threads.
+    """
+
+    def __init__(self, workers: int, queue: int):
+        self.workers = workers
+        self.queue = queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bcrypt"
+        )
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def run(self, fn: Callable[..., T], *args) -> T:
+        """
+        Run `fn(*args)` on the pool and wait for its result.
+
+        Raises:
+            HTTPException: 503 when the pool and its queue are full.
+        """
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins at the moment. Please retry.",
+                headers={"Retry-After": BCRYPT_RETRY_AFTER},
+            )
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+            with self.lock:
+                self.completed += 1
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "rounds": BCRYPT_ROUNDS,
+                "workers": self.workers,
+                "queue": self.queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+
+hashing_pool = HashingPool(BCRYPT_WORKERS, BCRYPT_QUEUE)
+
+
+def calibrate(target_ms: float, min_rounds: int = 4, max_rounds: int = 16) -> int:
+    """
+    Find the highest bcrypt cost whose hash takes at most `target_ms` here.
+
+    Args:
+        target_ms (float): The acceptable time for one hash, in milliseconds.
+        min_rounds (int): The lowest cost to consider.
+        max_rounds (int): The highest cost to consider.
+
+    Returns:
+        int: The chosen cost; `min_rounds` if even that is slower than the target.
+    """
+    chosen = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        samples = []
+        for _ in range(3):
+            start = time.perf_counter()
+            context.hash("calibration password")
+            samples.append((time.perf_counter() - start) * 1000)
+        elapsed = sorted(samples)[1]
+        print(f"rounds={rounds:2d} {elapsed:8.1f} ms")
+        if elapsed > target_ms:
+            break
+        chosen = rounds
+    return chosen
+
+
+def run():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    rounds = calibrate(target_ms)
+    print(f"BCRYPT_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    run()
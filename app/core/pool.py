@@ -0,0 +1,148 @@
+# Connection pool settings and live pool statistics
+import os
+import threading
+import time
+from uuid import uuid4
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+# DB_POOL_PROFILE picks one of these; the DB_POOL_* variables override single values.
+POOL_PROFILES = {
+    "web": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 5,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+    },
+    "worker": {
+        "pool_size": 2,
+        "max_overflow": 3,
+        "pool_timeout": 60,
+        "pool_recycle": 3600,
+        "pool_pre_ping": True,
+    },
+    # PgBouncer in transaction mode owns the pooling, so every checkout opens
+    # a fresh connection and no prepared statement may outlive a transaction.
+    "pgbouncer": {"poolclass": NullPool},
+}
+POOL_ENV = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_timeout": ("DB_POOL_TIMEOUT", float),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() in ("1", "true", "yes")),
+}
+POOL_PROFILE = os.getenv("DB_POOL_PROFILE", "web")
+
+
+class WaitStats:
+    """Running totals of the time spent waiting for a pooled connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_total_ms": round(self.total_wait * 1000, 3),
+                "wait_avg_ms": round(
+                    self.total_wait * 1000 / self.checkouts if self.checkouts else 0, 3
+                ),
+                "wait_max_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class TimedPoolMixin:
+    """Measure how long each checkout waits on the pool's queue."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = WaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(profile: str = POOL_PROFILE, is_async: bool = False) -> dict:
+    """
+    Build the pool keyword arguments for `create_engine`/`create_async_engine`.
+
+    Args:
+        profile (str): One of "web", "worker" or "pgbouncer".
+        is_async (bool): Whether the options are for the asyncpg engine.
+
+    Returns:
+        dict: Keyword arguments for the engine factory.
+
+    Raises:
+        ValueError: If the profile is unknown.
+    """
+    if profile not in POOL_PROFILES:
+        raise ValueError(
+            f"Unknown DB_POOL_PROFILE {profile!r}, expected one of {list(POOL_PROFILES)}"
+        )
+    options = dict(POOL_PROFILES[profile])
+    if options.get("poolclass") is NullPool:
+        if is_async:
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        return options
+    for key, (env, cast) in POOL_ENV.items():
+        value = os.getenv(env)
+        if value is not None:
+            options[key] = cast(value)
+    options["poolclass"] = TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool
+    return options
+
+
+def pool_status(engine: Engine) -> dict:
+    """
+    Report the current state of an engine's connection pool.
+
+    Args:
+        engine (Engine): The sync engine (use `AsyncEngine.sync_engine` for async).
+
+    Returns:
+        dict: Checked-out, idle and overflow connections plus checkout wait times.
+    """
+    pool = engine.pool
+    data = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update(
+            {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+            }
+        )
+    if isinstance(pool, TimedPoolMixin):
+        data.update(pool.wait_stats.as_dict())
+    return data
@@ -0,0 +1,146 @@
+from app.models import carts, users, products, orders
+from app.models.carts import CartModel
+from app.models.orders import OrderModel
+from app.models.products import ProductModel
+from app.core.database import async_engine, shard_engines
+from datetime import datetime, timedelta, timezone
+from fastapi import Request
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
+import os
+
+"""
+Background purge of soft-deleted products.
+
+Products deleted more than PRODUCT_PURGE_AFTER_HOURS ago are removed in
+batches of PRODUCT_PURGE_BATCH_SIZE, together with their image files. Orders
+keep their copy of the product name and price, and their product_id is
+cleared. The app runs `purge_loop` in the background and only purges while
+at most PRODUCT_PURGE_MAX_ACTIVE_REQUESTS requests are in flight. It can
+also be run from cron:
+
+    python -m app.core.purge
+"""
+
+PURGE_ENABLED = os.getenv("PRODUCT_PURGE_ENABLED", "true").lower() in ("1", "true")
+PURGE_AFTER_HOURS = float(os.getenv("PRODUCT_PURGE_AFTER_HOURS", "24"))
+PURGE_BATCH_SIZE = int(os.getenv("PRODUCT_PURGE_BATCH_SIZE", "500"))
+PURGE_INTERVAL = float(os.getenv("PRODUCT_PURGE_INTERVAL", "60"))
+PURGE_MAX_ACTIVE_REQUESTS = int(os.getenv("PRODUCT_PURGE_MAX_ACTIVE_REQUESTS", "2"))
+
+active_requests = 0
+
+
+async def activity_middleware(request: Request, call_next):
+    """Count the requests in flight, so the purge can wait for a quiet moment."""
+    global active_requests
+    active_requests += 1
+    try:
+        return await call_next(request)
+    finally:
+        active_requests -= 1
+
+
+def remove_images(image_paths: list[str]) -> None:
+    for image_path in image_paths:
+        image_path = image_path.replace("/", os.sep)
+        if os.path.exists(image_path):
+            try:
+                os.remove(image_path)
+            except Exception as e:
+                print("Cannot delete image.")
+
+
+async def purge_batch(engine: AsyncEngine, cutoff: datetime) -> int:
+    """
+    Remove one batch of products soft-deleted before `cutoff` from a database.
+
+    Args:
+        engine (AsyncEngine): The database (shard) holding the products.
+        cutoff (datetime): Products deleted before this moment are purged.
+
+    Returns:
+        int: The number of products removed.
+    """
+    async with engine.begin() as conn:
+        rows = (
+            await conn.execute(
+                select(ProductModel.id, ProductModel.image_path)
+                .where(ProductModel.deleted_at < cutoff)
+                .order_by(ProductModel.deleted_at)
+                .limit(PURGE_BATCH_SIZE)
+            )
+        ).all()
+        if not rows:
+            return 0
+        ids = [row.id for row in rows]
+        # Carts live on the primary database.
+        if engine is async_engine:
+            await conn.execute(delete(CartModel).where(CartModel.product_id.in_(ids)))
+        else:
+            async with async_engine.begin() as primary:
+                await primary.execute(
+                    delete(CartModel).where(CartModel.product_id.in_(ids))
+                )
+        await conn.execute(
+            update(OrderModel)
+            .where(OrderModel.product_id.in_(ids))
+            .values(product_id=None)
+        )
+        await conn.execute(delete(ProductModel).where(ProductModel.id.in_(ids)))
+    await asyncio.to_thread(
+        remove_images, [row.image_path for row in rows if row.image_path]
+    )
+    return len(rows)
+
+
+async def purge_deleted_products(wait_for_idle: bool = False) -> int:
+    """
+    Purge every product soft-deleted longer than PRODUCT_PURGE_AFTER_HOURS ago.
+
+    Args:
+        wait_for_idle (bool): Stop between batches when the app gets busy.
+
+    Returns:
+        int: The number of products removed.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=PURGE_AFTER_HOURS)
+    purged = 0
+    for engine in shard_engines.values():
+        while True:
+            if wait_for_idle and active_requests > PURGE_MAX_ACTIVE_REQUESTS:
+                return purged
+            removed = await purge_batch(engine, cutoff)
+            purged += removed
+            if removed < PURGE_BATCH_SIZE:
+                break
+    return purged
+
+
+async def purge_loop() -> None:
+    """Purge soft-deleted products every PRODUCT_PURGE_INTERVAL seconds while idle."""
+    while True:
+        await asyncio.sleep(PURGE_INTERVAL)
+        if active_requests > PURGE_MAX_ACTIVE_REQUESTS:
+            continue
+        try:
+            purged = await purge_deleted_products(wait_for_idle=True)
+            if purged:
+                print(f"Purged {purged} deleted products.")
+        except Exception as e:
+            print(f"Product purge failed: {e}")
+
+
+def run():
+    async def purge():
+        purged = await purge_deleted_products()
+        for engine in shard_engines.values():
+            await engine.dispose()
+        return purged
+
+    print(f"Purged {asyncio.run(purge())} deleted products.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,130 @@
+# Per-request query counting, N+1 detection and query budgets
+import os
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "5"))
+QUERY_BUDGET_STRICT = os.getenv("DB_QUERY_BUDGET_STRICT", "").lower() in ("1", "true")
+
+# Maximum statements per endpoint, keyed by "METHOD /route/path". Declared
+# by the test suite with set_query_budget (tests/test_query_budgets.py).
+QUERY_BUDGETS: dict[str, int] = {}
+
+PARAM_LIST = re.compile(
+    r"\(\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|\$\d+|:\w+))*\s*\)"
+)
+PARAM = re.compile(r"%\(\w+\)s|%s|\$\d+|:\w+")
+WHITESPACE = re.compile(r"\s+")
+
+current_stats: ContextVar["QueryStats | None"] = ContextVar(
+    "current_stats", default=None
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when an endpoint runs more statements than its budget."""
+
+
+class QueryStats:
+    """Statements and database time collected for a single request."""
+
+    def __init__(self, route: str = ""):
+        self.route = route
+        self.count = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.db_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> dict[str, int]:
+        return {s: n for s, n in self.shapes.items() if n >= threshold}
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalise a statement so queries that differ only in parameters compare equal.
+
+    Args:
+        statement (str): The SQL string sent to the driver.
+
+    Returns:
+        str: The statement with placeholders and IN-lists collapsed.
+    """
+    shape = PARAM_LIST.sub("(?)", statement)
+    shape = PARAM.sub("?", shape)
+    return WHITESPACE.sub(" ", shape).strip()
+
+
+def set_query_budget(endpoint: str, limit: int) -> None:
+    """
+    Declare the maximum number of statements an endpoint may run.
+
+    Args:
+        endpoint (str): "METHOD /route/path", e.g. "GET /cart/get".
+        limit (int): The maximum statement count per request.
+    """
+    QUERY_BUDGETS[endpoint] = limit
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Attach the statement counters to an engine.
+
+    Args:
+        engine (Engine): The sync engine (use `AsyncEngine.sync_engine` for async).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        """BEFORE CURSOR EXECUTE EVENT"""
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        """AFTER CURSOR EXECUTE EVENT"""
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = current_stats.get()
+        # EXPLAIN of a slow query (app.core.slow_query) is not the request's.
+        if stats is not None and not conn.info.get("explaining"):
+            stats.record(statement, elapsed)
+
+
+async def query_stats_middleware(request: Request, call_next):
+    """
+    Collect query statistics for each request and report them in response headers.
+
+    Repeated statement shapes are logged as possible N+1 patterns, and
+    requests that exceed their endpoint's budget are logged, or raise
+    QueryBudgetExceeded when DB_QUERY_BUDGET_STRICT is set.
+    """
+    stats = QueryStats(f"{request.method} {request.url.path}")
+    token = current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        current_stats.reset(token)
+
+    route = request.scope.get("route")
+    if route is not None:
+        stats.route = f"{request.method} {route.path}"
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Time-Ms"] = f"{stats.db_time * 1000:.2f}"
+
+    for shape, repeats in stats.repeated_shapes().items():
+        print(f"Possible N+1 in {stats.route}: {repeats}x {shape[:200]}")
+
+    budget = QUERY_BUDGETS.get(stats.route)
+    if budget is not None and stats.count > budget:
+        message = f"{stats.route} ran {stats.count} queries, budget is {budget}."
+        if QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
+        print(message)
+    return response
@@ -0,0 +1,203 @@
+# Sliding-window login throttling per account and per client address
+import ipaddress
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from fastapi import HTTPException, Request, status
+
+LOGIN_EMAIL_LIMIT = int(os.getenv("LOGIN_EMAIL_LIMIT", "10"))
+LOGIN_EMAIL_WINDOW = float(os.getenv("LOGIN_EMAIL_WINDOW", "300"))
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "50"))
+LOGIN_IP_WINDOW = float(os.getenv("LOGIN_IP_WINDOW", "300"))
+# Set to share the counters between workers, e.g. redis://localhost:6379/0.
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Buckets kept by the in-process store; the oldest are dropped beyond this.
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Reverse proxies whose X-Forwarded-For is believed, as addresses or
+# networks, e.g. "10.0.0.0/8,127.0.0.1". Empty trusts no header.
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(proxy.strip(), strict=False)
+    for proxy in os.getenv("TRUSTED_PROXIES", "").split(",")
+    if proxy.strip()
+]
+
+
+class MemoryStore:
+    """
+    Attempt counters of this worker, one per key and time bucket.
+
+    With several workers each one counts separately, so the effective
+    limit is multiplied by the number of workers.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.counts: OrderedDict[tuple[str, int], int] = OrderedDict()
+
+    def get(self, key: str, buckets: tuple[int, int]) -> tuple[int, int]:
+        with self.lock:
+            return tuple(self.counts.get((key, bucket), 0) for bucket in buckets)
+
+    def incr(self, key: str, bucket: int, window: float) -> None:
+        with self.lock:
+            self.counts[(key, bucket)] = self.counts.get((key, bucket), 0) + 1
+            self.counts.move_to_end((key, bucket))
+            while len(self.counts) > self.max_keys:
+                self.counts.popitem(last=False)
+
+
+class RedisStore:
+    """
+    Attempt counters shared by every worker, as Redis keys that expire
+    once their bucket can no longer be part of a window.
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str, buckets: tuple[int, int]) -> tuple[int, int]:
+        values = self.client.mget([f"login:{key}:{bucket}" for bucket in buckets])
+        return tuple(int(value or 0) for value in values)
+
+    def incr(self, key: str, bucket: int, window: float) -> None:
+        name = f"login:{key}:{bucket}"
+        with self.client.pipeline() as pipe:
+            pipe.incr(name)
+            pipe.expire(name, math.ceil(window * 2))
+            pipe.execute()
+
+
+class SlidingWindowLimiter:
+    """
+    At most `limit` attempts per key in any `window` seconds.
+
+    The window is approximated from two fixed buckets: the current count
+    plus the previous bucket's count weighted by how much of it still
+    overlaps the window. Rejected attempts are not counted, so a key
+    recovers as soon as its earlier attempts age out.
+    """
+
+    def __init__(self, scope: str, limit: int, window: float, store):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.store = store
+
+    def hit(self, key: str) -> float | None:
+        """
+        Count an attempt for `key` if it is within the limit.
+
+        Returns:
+            float | None: None if the attempt is allowed, otherwise the
+            seconds to wait.
+        """
+        key = f"{self.scope}:{key}"
+        now = time.time()
+        bucket = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        previous, current = self.store.get(key, (bucket - 1, bucket))
+        if previous * (1 - elapsed) + current < self.limit:
+            self.store.incr(key, bucket, self.window)
+            return None
+        if current >= self.limit or not previous:
+            return self.window * (1 - elapsed)
+        # When the previous bucket's weight has dropped enough.
+        return self.window * (1 - (self.limit - current) / previous - elapsed)
+
+
+store = (
+    RedisStore(RATE_LIMIT_REDIS_URL)
+    if RATE_LIMIT_REDIS_URL
+    else MemoryStore(RATE_LIMIT_MAX_KEYS)
+)
+email_limiter = SlidingWindowLimiter(
+    "email", LOGIN_EMAIL_LIMIT, LOGIN_EMAIL_WINDOW, store
+)
+ip_limiter = SlidingWindowLimiter("ip", LOGIN_IP_LIMIT, LOGIN_IP_WINDOW, store)
+# Login attempts let through and refused, the latter by limiter scope.
+login_attempts = Counter()
+
+
+def is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def client_address(request: Request) -> str:
+    """
+    Return the address of the client that sent a request.
+
+    Behind trusted proxies the client is the last X-Forwarded-For hop that
+    is not one of them, reading from the right: the hops before it were
+    written by the client and can be anything.
+
+    Args:
+        request (Request): The HTTP request.
+
+    Returns:
+        str: The client address, or "unknown".
+    """
+    address = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(address):
+        return address
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        address = hop
+        if not is_trusted_proxy(hop):
+            break
+    return address
+
+
+def throttle_login(request: Request, email: str) -> None:
+    """
+    Refuse a login attempt once the account or the client is over its limit.
+
+    Called before the user lookup and the password check, so refused
+    attempts cost neither a query nor a bcrypt hash.
+
+    Args:
+        request (Request): The HTTP request, for the client address.
+        email (str): The email the attempt is for.
+
+    Raises:
+        HTTPException: 429 with a Retry-After header when over the limit.
+    """
+    client = client_address(request)
+    for limiter, key in (
+        (ip_limiter, client),
+        (email_limiter, email.strip().lower()),
+    ):
+        wait = limiter.hit(key)
+        if wait is not None:
+            login_attempts[f"rejected_{limiter.scope}"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts. Please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))},
+            )
+    login_attempts["allowed"] += 1
+
+
+def throttle_stats() -> dict:
+    """Return the limits, the store in use and the attempt counters."""
+    return {
+        "store": type(store).__name__,
+        "limits": {
+            limiter.scope: {"limit": limiter.limit, "window": limiter.window}
+            for limiter in (email_limiter, ip_limiter)
+        },
+        "attempts": dict(login_attempts),
+    }
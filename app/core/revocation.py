@@ -0,0 +1,213 @@
+# Refresh token revocation: DB table with a per-worker Bloom filter in front
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.revoked_tokens import RevokedTokenModel
+
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+# How often a worker picks up revocations made by the other workers.
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+# How often the filter is rebuilt without the expired revocations.
+REVOCATION_REBUILD_SECONDS = float(os.getenv("REVOCATION_REBUILD_SECONDS", "3600"))
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and a bounded false positive rate.
+
+    Sized for `capacity` items at `error_rate`; the k bit positions of an
+    item are derived from one blake2b digest (double hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self.positions(item)
+        )
+
+
+class RevocationStore:
+    """
+    Revoked refresh tokens and token families of one worker.
+
+    The revoked_tokens table is the source of truth. Each worker mirrors it
+    in a Bloom filter, so checking a token that was never revoked, the
+    common case, needs no query; only filter hits are confirmed in the
+    table. Revocations made by other workers are picked up every
+    REVOCATION_SYNC_SECONDS.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.last_revoked_at = None
+        self.checks = 0
+        self.confirmations = 0
+        self.false_positives = 0
+
+    def sync(self, db: Session) -> None:
+        """Load the revocations made since the last sync, or rebuild the filter."""
+        now = time.monotonic()
+        with self.lock:
+            if (
+                self.bloom is not None
+                and now - self.synced_at < REVOCATION_SYNC_SECONDS
+            ):
+                return
+            rebuild = (
+                self.bloom is None or now - self.built_at > REVOCATION_REBUILD_SECONDS
+            )
+            self.synced_at = now
+        query = select(RevokedTokenModel.token_id, RevokedTokenModel.revoked_at)
+        if rebuild:
+            db.execute(
+                delete(RevokedTokenModel).where(
+                    RevokedTokenModel.expires_at < datetime.now(timezone.utc)
+                )
+            )
+            db.commit()
+        elif self.last_revoked_at is not None:
+            # Overlap the previous sync, for rows committed out of order.
+            since = self.last_revoked_at - timedelta(seconds=REVOCATION_SYNC_SECONDS)
+            query = query.where(RevokedTokenModel.revoked_at >= since)
+        rows = db.execute(query).all()
+        with self.lock:
+            if rebuild:
+                self.bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_ERROR_RATE)
+                self.built_at = now
+            for row in rows:
+                self.bloom.add(row.token_id)
+                if (
+                    self.last_revoked_at is None
+                    or row.revoked_at > self.last_revoked_at
+                ):
+                    self.last_revoked_at = row.revoked_at
+
+    def is_revoked(self, db: Session, token_id: str) -> bool:
+        """
+        Check whether a token or token family has been revoked.
+
+        Args:
+            db (Session): The database session, used only on a filter hit.
+            token_id (str): The jti or family id.
+
+        Returns:
+            bool: True if it is revoked.
+        """
+        return self.revoked_at(db, token_id) is not None
+
+    def revoked_at(self, db: Session, token_id: str) -> datetime | None:
+        """
+        Return when a token, token family or user was revoked.
+
+        Args:
+            db (Session): The database session, used only on a filter hit.
+            token_id (str): The jti, family id or "user:<id>".
+
+        Returns:
+            datetime | None: The time of the revocation, or None if there is none.
+        """
+        self.sync(db)
+        with self.lock:
+            self.checks += 1
+            if token_id not in self.bloom:
+                return None
+            self.confirmations += 1
+        row = db.get(RevokedTokenModel, token_id)
+        if row is not None:
+            return row.revoked_at
+        with self.lock:
+            self.false_positives += 1
+        return None
+
+    def revoke(
+        self, db: Session, token_id: str, kind: str, expires_at: datetime
+    ) -> bool:
+        """
+        Record a revocation and commit it.
+
+        Args:
+            db (Session): The database session.
+            token_id (str): The jti or family id.
+            kind (str): "token" or "family".
+            expires_at (datetime): When the revoked token(s) expire anyway;
+                                   the row can be dropped after that.
+
+        Returns:
+            bool: False if it was already revoked, which for a rotated
+            refresh token means it is being reused.
+        """
+        try:
+            db.add(
+                RevokedTokenModel(token_id=token_id, kind=kind, expires_at=expires_at)
+            )
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(token_id)
+        return True
+
+    def revoke_user(self, db: Session, user_id: int, expires_at: datetime) -> None:
+        """
+        Revoke every refresh token issued to a user until now, e.g. when the
+        account is deleted. A later revocation moves the cut-off forward.
+
+        Args:
+            db (Session): The database session.
+            user_id (int): The ID of the user.
+            expires_at (datetime): When the user's current refresh tokens expire.
+        """
+        token_id = f"user:{user_id}"
+        if not self.revoke(db, token_id, "user", expires_at):
+            db.execute(
+                update(RevokedTokenModel)
+                .where(RevokedTokenModel.token_id == token_id)
+                .values(revoked_at=func.now(), expires_at=expires_at)
+            )
+            db.commit()
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            bloom = self.bloom
+            return {
+                "entries": bloom.count if bloom else 0,
+                "bits": bloom.size if bloom else 0,
+                "hashes": bloom.hashes if bloom else 0,
+                "checks": self.checks,
+                "confirmations": self.confirmations,
+                "false_positives": self.false_positives,
+            }
+
+
+revocations = RevocationStore()
@@ -0,0 +1,72 @@
+# Read replica routing for the asyncio session
+import os
+import random
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+RECENT_WRITE_COOKIE = "recent_write"
+RECENT_WRITE_SECONDS = int(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))
+
+
+class RoutingSession(Session):
+    """
+    Session that sends read-only work to a replica and everything else to the primary.
+
+    A request is read-only when `get_async_db` sets `info["read_only"]`. Flushes
+    always go to the primary, and a session sticks to one replica so all reads
+    of a request see the same snapshot.
+    """
+
+    def __init__(self, *args, replicas=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = list(replicas)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.replicas and self.info.get("read_only") and not self._flushing:
+            if "replica" not in self.info:
+                self.info["replica"] = random.choice(self.replicas)
+            return self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def mark_recent_write(response: Response) -> None:
+    """
+    Set the short-lived cookie that pins the client's next reads to the primary.
+
+    Args:
+        response (Response): The response object to set the cookie in.
+    """
+    response.set_cookie(
+        key=RECENT_WRITE_COOKIE,
+        value="1",
+        httponly=True,
+        secure=False,
+        samesite="lax",
+        max_age=RECENT_WRITE_SECONDS,
+    )
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def remember_flush(session, flush_context) -> None:
+    """AFTER FLUSH EVENT"""
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def remember_bulk_write(orm_execute_state) -> None:
+    """ORM EXECUTE EVENT"""
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def pin_reads_after_commit(session) -> None:
+    """AFTER COMMIT EVENT"""
+    response = session.info.get("response")
+    if session.info.pop("wrote", False) and response is not None:
+        mark_recent_write(response)
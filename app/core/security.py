@@ -1,18 +1,31 @@
 # JWT generation, hash and verify password, current user logic
 from fastapi import Request, HTTPException, status, Depends, Response
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
+from collections import Counter
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta
 from app.models.users import UserModel
-from app.core.database import get_db
+from app.core.cache import user_cache, token_cache, invalidate_on_commit
+from app.core.database import get_db, get_async_db
+from app.core.hashing import pwd_context, hashing_pool
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ACCESS_TOKEN_EXPIRE = 30
 REFRESH_TOKEN_EXPIRE = 7
 SECRET_KEY = "secret"
 REFRESH_TOKEN_SECRET = "secretrefresh"
 ALGORITHM = "HS256"
+# Claims signed into the tokens next to `sub`, enough for most routes.
+USER_CLAIMS = ("role", "name")
+# Columns kept in the user cache; the password hash is never cached.
+CACHED_USER_COLUMNS = ("id", "name", "email", "role")
+DELETED_USER = "deleted"
+# Where the current user came from: "cache", "claims" or "database".
+auth_sources = Counter()
 
 
 def hash_pwd(password: str) -> str:
@@ -23,8 +36,11 @@ def hash_pwd(password: str) -> str:
 
     Returns:
         str: The hashed password.
+
+    Raises:
+        HTTPException: 503 if the hashing pool is saturated.
     """
-    return pwd_context.hash(password)
+    return hashing_pool.run(pwd_context.hash, password)
 
 
 def verify_pwd(password: str, hashed_pwd: str) -> bool:
@@ -36,8 +52,28 @@ def verify_pwd(password: str, hashed_pwd: str) -> bool:
 
     Returns:
         bool: True if the password matches the hashed password, False otherwise.
+
+    Raises:
+        HTTPException: 503 if the hashing pool is saturated.
+    """
+    return hashing_pool.run(pwd_context.verify, password, hashed_pwd)
+
+
+def verify_and_update_pwd(password: str, hashed_pwd: str) -> tuple[bool, str | None]:
+    """Verify a password and rehash it if its hash uses an outdated cost.
+
+    Args:
+        password (str): The password to verify.
+        hashed_pwd (str): The hashed password to verify against.
+
+    Returns:
+        tuple[bool, str | None]: Whether the password matches, and the new hash
+        to store when the stored one should be replaced.
+
+    Raises:
+        HTTPException: 503 if the hashing pool is saturated.
     """
-    return pwd_context.verify(password, hashed_pwd)
+    return hashing_pool.run(pwd_context.verify_and_update, password, hashed_pwd)
 
 
 def create_access_token(data: dict) -> str:
@@ -58,13 +94,39 @@ def create_access_token(data: dict) -> str:
 
 
 def create_refresh_token(data: dict) -> str:
+    """Generate a JWT refresh token for the given data.
+
+    Every refresh token gets its own id (`jti`) so it can be used only once.
+    Tokens rotated from the same login share a family id (`fam`), which is
+    kept from `data` or started here. The issue time (`iat`) tells whether
+    the token predates a revocation of all the user's tokens.
+
+    Args:
+        data (dict): The data to encode in the JWT token.
+
+    Returns:
+        str: The JWT refresh token.
+    """
     to_encode = data.copy()
     expire = datetime.now() + timedelta(days=REFRESH_TOKEN_EXPIRE)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
+    to_encode.setdefault("fam", uuid.uuid4().hex)
     encode_jwt = jwt.encode(to_encode, REFRESH_TOKEN_SECRET, algorithm=ALGORITHM)
     return encode_jwt
 
 
+def token_claims(user: UserModel) -> dict:
+    """Build the claims identifying a user in the access and refresh tokens.
+
+    Args:
+        user (UserModel): The user logging in.
+
+    Returns:
+        dict: The `sub`, `role` and `name` claims.
+    """
+    return {"sub": str(user.id), "role": user.role, "name": user.name}
+
+
 def set_access_token(response: Response, token: str):
     """Set the given JWT token as an HTTPOnly cookie in the response.
 
@@ -101,18 +163,55 @@ def set_refresh_token(response: Response, token: str):
     )
 
 
-def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserModel:
-    """Retrieve the current user based on the access token in the request cookies.
+def token_key(token: str) -> str:
+    """Key of a raw token in the token cache; the token itself is never stored."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_access_token(token: str) -> dict:
+    """Verify an access token and return its claims, using the token cache.
+
+    A token whose signature and expiry were verified once is served from
+    the cache until its `exp`, skipping the decode and HMAC check.
+
+    Args:
+        token (str): The raw access token.
+
+    Returns:
+        dict: The token payload.
+
+    Raises:
+        JWTError: If the token is invalid or expired.
+    """
+    key = token_key(token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        return dict(claims)
+    claims = jwt.decode(
+        token, SECRET_KEY, algorithms=ALGORITHM, options={"verify_signature": True}
+    )
+    if claims and "exp" in claims:
+        token_cache.set(key, claims, ttl=claims["exp"] - time.time())
+    return dict(claims)
+
+
+def evict_token(token: str | None) -> None:
+    """Drop an access token from the token cache, e.g. on logout."""
+    if token:
+        token_cache.invalidate(token_key(token))
+
+
+def get_token_claims(request: Request) -> dict:
+    """Decode the access token in the request cookies and return its claims.
 
     Args:
         request (Request): The HTTP request containing the cookies.
-        db (Session): The database session dependency.
 
     Returns:
-        UserModel: The user model instance corresponding to the token's subject.
+        dict: The token payload; `sub` holds the user id.
 
     Raises:
-        HTTPException: If the access token is missing, expired, invalid, or if the user is not found.
+        HTTPException: If the access token is missing, expired or invalid.
     """
 
     token = request.cookies.get("access_token")
@@ -122,9 +221,7 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserMod
             detail="Please Login Before continuing.",
         )
     try:
-        payload = jwt.decode(
-            token, SECRET_KEY, algorithms=ALGORITHM, options={"verify_signature": True}
-        )
+        payload = decode_access_token(token)
         if not payload:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -140,14 +237,154 @@ def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserMod
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token."
         )
-    data = db.query(UserModel).filter(UserModel.id == user_id).first()
+    return payload
+
+
+def get_token_subject(request: Request) -> str:
+    """Decode the access token in the request cookies and return its subject.
+
+    Args:
+        request (Request): The HTTP request containing the cookies.
+
+    Returns:
+        str: The user id stored in the token's `sub` claim.
+
+    Raises:
+        HTTPException: If the access token is missing, expired or invalid.
+    """
+    return get_token_claims(request)["sub"]
+
+
+def cache_user(user: UserModel) -> None:
+    """Store a user's row, without the password hash, in the user cache."""
+    user_cache.set(user.id, {c: getattr(user, c) for c in CACHED_USER_COLUMNS})
+
+
+def invalidate_user(db: Session, user_id: int, deleted: bool = False) -> None:
+    """Drop a user from the user cache when the session commits.
+
+    Args:
+        db (Session): The session changing the user.
+        user_id (int): The user's id.
+        deleted (bool): Also remember, until the access tokens have expired,
+                        that the user is gone, so their token claims are refused.
+    """
+    if not deleted:
+        invalidate_on_commit(db, user_cache, user_id)
+        return
+    user_cache.invalidate(user_id)
+    db.info.setdefault("deleted_users", set()).add(user_id)
+
+
+def cached_user(claims: dict) -> UserModel | None:
+    """Build the current user from the user cache or the token claims, without a query.
+
+    Args:
+        claims (dict): The access token payload.
+
+    Returns:
+        UserModel | None: A detached user holding at least `id`, `role` and
+        `name`, or None when neither the cache nor the token has them.
+
+    Raises:
+        HTTPException: If the user has been deleted.
+    """
+    user_id = int(claims["sub"])
+    row = user_cache.get(user_id)
+    if row == DELETED_USER:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User Not Found."
+        )
+    if row is not None:
+        auth_sources["cache"] += 1
+    elif all(claim in claims for claim in USER_CLAIMS):
+        auth_sources["claims"] += 1
+        row = {"id": user_id, **{claim: claims[claim] for claim in USER_CLAIMS}}
+    else:
+        auth_sources["database"] += 1
+        return None
+    user = UserModel(**row)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> UserModel:
+    """Retrieve the current user based on the access token in the request cookies.
+
+    The user comes from the user cache or the token claims when possible,
+    attached to the session without a query; columns missing from the
+    claims are loaded on first access.
+
+    Args:
+        request (Request): The HTTP request containing the cookies.
+        db (Session): The database session dependency.
+
+    Returns:
+        UserModel: The user model instance corresponding to the token's subject.
+
+    Raises:
+        HTTPException: If the access token is missing, expired, invalid, or if the user is not found.
+    """
+
+    claims = get_token_claims(request)
+    user = cached_user(claims)
+    if user is not None:
+        return db.merge(user, load=False)
+    data = db.get(UserModel, int(claims["sub"]))
+    if not data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User Not Found."
+        )
+    cache_user(data)
+    return data
+
+
+async def get_async_current_user(
+    request: Request, db: AsyncSession = Depends(get_async_db)
+) -> UserModel:
+    """Retrieve the current user for the `async def` routes.
+
+    The async routes only read `id`, `role` and `name`, so a user from the
+    user cache or the token claims is returned detached, without a query.
+    Otherwise the user is loaded through the request's AsyncSession.
+
+    Args:
+        request (Request): The HTTP request containing the cookies.
+        db (AsyncSession): The asyncio database session dependency.
+
+    Returns:
+        UserModel: The user model instance corresponding to the token's subject.
+
+    Raises:
+        HTTPException: If the access token is missing, expired, invalid, or if the user is not found.
+    """
+
+    claims = get_token_claims(request)
+    user = cached_user(claims)
+    if user is not None:
+        return user
+    data = await db.get(UserModel, int(claims["sub"]))
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User Not Found."
         )
+    cache_user(data)
     return data
 
 
+@event.listens_for(Session, "after_commit")
+def remember_deleted_users(session) -> None:
+    """AFTER COMMIT EVENT"""
+    for user_id in session.info.pop("deleted_users", ()):
+        user_cache.set(user_id, DELETED_USER, ttl=ACCESS_TOKEN_EXPIRE * 60)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_deleted_users(session) -> None:
+    """AFTER ROLLBACK EVENT"""
+    session.info.pop("deleted_users", None)
+
+
 def is_logged_in(request: Request) -> dict[str, str] | None:
     """Check if a user is already logged in.
 
@@ -161,7 +398,7 @@ def is_logged_in(request: Request) -> dict[str, str] | None:
 
     if token:
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = decode_access_token(token)
 
             if payload:
 
@@ -0,0 +1,309 @@
+# Horizontal sharding of products and orders by seller
+"""
+Products live on the shard of their seller (`owner_id % SHARD_COUNT`), and
+orders live on the shard of the product they were placed for. Shard 0 is
+the primary database, which also keeps users and carts.
+
+Product and order ids are interleaved across shards, so the shard of a row
+can be derived from its primary key without a lookup. On PostgreSQL the
+shard's id sequences do this (`prepare_shards`); on SQLite `allocate_id`
+picks the next id of the shard when a row is inserted. Foreign keys between shards (products and
+orders to users, carts to products) cannot be enforced by the databases:
+they are not created on the extra shards, and carts have no foreign key to
+products while sharding is on. A checkout that touches several
+shards commits them one after another; it is not atomic across shards.
+"""
+import heapq
+import os
+from itertools import islice
+from sqlalchemy import MetaData, func, select, text
+from sqlalchemy.ext.horizontal_shard import set_shard_id
+from sqlalchemy.orm import ORMExecuteState
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BindParameter
+from sqlalchemy.sql.schema import Column
+
+# Extra shard databases; shard "0" is always DATABASE_URL.
+SHARD_URLS = [u for u in os.getenv("DATABASE_SHARD_URLS", "").split(",") if u]
+SHARD_COUNT = 1 + len(SHARD_URLS)
+SHARDING_ENABLED = SHARD_COUNT > 1
+HOME_SHARD = "0"
+SHARD_IDS = [str(i) for i in range(SHARD_COUNT)]
+SHARDED_TABLES = ("products", "orders")
+
+
+def shard_for_owner(owner_id: int) -> str:
+    """Return the shard holding the products of a seller."""
+    return str(int(owner_id) % SHARD_COUNT)
+
+
+def shard_for_id(row_id: int) -> str:
+    """Return the shard that allocated a product or order id."""
+    return str((int(row_id) - 1) % SHARD_COUNT)
+
+
+def next_shard_id(max_id: int | None, shard_id: str) -> int:
+    """Return the smallest id above `max_id` that `shard_for_id` maps to the shard."""
+    max_id = max_id or 0
+    return max_id + 1 + (int(shard_id) - max_id) % SHARD_COUNT
+
+
+def is_sharded(mapper) -> bool:
+    return mapper is not None and mapper.local_table.name in SHARDED_TABLES
+
+
+def shard_chooser(mapper, instance, clause=None) -> str:
+    """
+    Pick the shard a new instance is written to.
+
+    Args:
+        mapper (Mapper): The mapper of the instance.
+        instance: The mapped instance being flushed, if any.
+        clause: The SQL clause being executed, if any.
+
+    Returns:
+        str: The shard id.
+    """
+    if instance is None or not is_sharded(mapper):
+        return HOME_SHARD
+    if mapper.local_table.name == "products":
+        return shard_for_owner(instance.owner_id)
+    return shard_for_id(instance.product_id)
+
+
+def allocate_id(mapper, connection, target) -> None:
+    """
+    BEFORE INSERT EVENT
+
+    Give a new product or order the next id of its shard on databases
+    without interleaved sequences. Ids allocated earlier on the connection
+    count too, since a flush runs this for all its rows before inserting.
+    """
+    if not is_sharded(mapper) or target.id is not None:
+        return
+    if connection.dialect.name == "postgresql":
+        return
+    table = mapper.local_table
+    allocated = connection.info.setdefault("allocated_ids", {})
+    max_id = max(
+        connection.scalar(select(func.max(table.c.id))) or 0,
+        allocated.get(table.name, 0),
+    )
+    target.id = next_shard_id(max_id, shard_chooser(mapper, target))
+    allocated[table.name] = target.id
+
+
+def identity_chooser(mapper, primary_key, **kwargs) -> list[str]:
+    """Return the shard a primary key lives on."""
+    if not is_sharded(mapper):
+        return [HOME_SHARD]
+    return [shard_for_id(primary_key[0])]
+
+
+def criteria_values(orm_context: ORMExecuteState, table: str, column: str) -> set:
+    """
+    Collect the values a statement compares `table.column` against with = or IN.
+
+    Args:
+        orm_context (ORMExecuteState): The statement being executed.
+        table (str): The table name.
+        column (str): The column name.
+
+    Returns:
+        set: The compared values; empty when the column is not restricted.
+    """
+    values = set()
+    where = getattr(orm_context.statement, "whereclause", None)
+    if where is None:
+        return values
+    parameters = (
+        orm_context.parameters if isinstance(orm_context.parameters, dict) else {}
+    )
+
+    def visit_binary(binary):
+        left, right = binary.left, binary.right
+        if isinstance(left, BindParameter) and isinstance(right, Column):
+            left, right = right, left
+        if not (isinstance(left, Column) and isinstance(right, BindParameter)):
+            return
+        if left.table is None or left.table.name != table or left.key != column:
+            return
+        value = parameters.get(right.key, right.effective_value)
+        if value is None:
+            return
+        if binary.operator is operators.eq:
+            values.add(value)
+        elif binary.operator is operators.in_op:
+            values.update(value)
+
+    visitors.traverse(where, {}, {"binary": visit_binary})
+    return values
+
+
+def execute_chooser(orm_context: ORMExecuteState) -> list[str]:
+    """
+    Return the shards a SELECT, UPDATE or DELETE has to run on.
+
+    Statements on products restricted by `owner_id` or `id`, and on orders
+    restricted by `id` or `product_id`, go to the matching shards. All other
+    statements on sharded tables fan out to every shard.
+    """
+    mappers = [m for m in orm_context.all_mappers if is_sharded(m)]
+    if not mappers:
+        return [HOME_SHARD]
+    table = mappers[0].local_table.name
+    if table == "products":
+        owners = criteria_values(orm_context, "products", "owner_id")
+        if owners:
+            return sorted({shard_for_owner(o) for o in owners})
+        ids = criteria_values(orm_context, "products", "id")
+    else:
+        ids = criteria_values(orm_context, "orders", "id") or criteria_values(
+            orm_context, "orders", "product_id"
+        )
+    if ids:
+        return sorted({shard_for_id(i) for i in ids})
+    return SHARD_IDS
+
+
+async def fan_out(
+    db, statement, limit: int, offset: int, key, reverse=False, scalars=True
+):
+    """
+    Run a listing on every shard and merge the pages with the same sort and limit.
+
+    Each shard returns its first `offset + limit` rows in the statement's
+    order; merging those sorted runs and slicing gives the same page a
+    single database would.
+
+    Args:
+        db (AsyncSession): The sharded database session.
+        statement (Select): The ordered statement, without limit and offset.
+        limit (int): The page size.
+        offset (int): The number of rows to skip.
+        key (Callable): Sort key matching the statement's ORDER BY.
+        reverse (bool): Whether the ORDER BY is descending.
+        scalars (bool): Whether to return ORM objects rather than rows.
+
+    Returns:
+        list: The merged page.
+    """
+    runs = []
+    for shard_id in SHARD_IDS:
+        result = await db.execute(
+            statement.limit(offset + limit).options(set_shard_id(shard_id))
+        )
+        runs.append(result.scalars().all() if scalars else result.all())
+    merged = heapq.merge(*runs, key=key, reverse=reverse)
+    return list(islice(merged, offset, offset + limit))
+
+
+def shard_metadata(metadata: MetaData) -> MetaData:
+    """
+    Copy the sharded tables without the foreign keys that point to other databases.
+
+    Their DDL event listeners are copied too, so create_all() sets up the
+    same extra objects on every shard.
+
+    Args:
+        metadata (MetaData): The application metadata.
+
+    Returns:
+        MetaData: Metadata holding only products and orders.
+    """
+    shard_meta = MetaData()
+    for name in SHARDED_TABLES:
+        table = metadata.tables[name].to_metadata(shard_meta)
+        # to_metadata() leaves out DDL listeners such as the search index setup.
+        table.dispatch._update(metadata.tables[name].dispatch, only_propagate=False)
+        for fk in list(table.foreign_key_constraints):
+            if fk.elements[0].target_fullname.split(".")[0] not in SHARDED_TABLES:
+                table.constraints.discard(fk)
+                for element in fk.elements:
+                    element.parent.foreign_keys.discard(element)
+                    table.foreign_keys.discard(element)
+    return shard_meta
+
+
+def drop_sqlite_cart_foreign_key(metadata: MetaData, engine) -> None:
+    """
+    Rebuild the carts table of a SQLite database without its foreign key to products.
+
+    SQLite cannot drop a foreign key, and enforces it, so a cart row for a
+    product on another shard would be refused. New databases are created
+    without it; this converts one created before sharding was turned on.
+    """
+    with engine.connect() as conn:
+        references = conn.exec_driver_sql("PRAGMA foreign_key_list(carts)").all()
+        if not any(reference[2] == "products" for reference in references):
+            return
+        columns = ", ".join(c.name for c in metadata.tables["carts"].columns)
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conn.commit()
+        try:
+            conn.exec_driver_sql("ALTER TABLE carts RENAME TO carts_old")
+            metadata.tables["carts"].create(conn)
+            conn.exec_driver_sql(
+                f"INSERT INTO carts ({columns}) SELECT {columns} FROM carts_old"
+            )
+            conn.exec_driver_sql("DROP TABLE carts_old")
+            conn.commit()
+        finally:
+            conn.rollback()
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+            conn.commit()
+
+
+def prepare_shards(metadata: MetaData, engines: dict) -> None:
+    """
+    Create the sharded tables and interleave their id sequences.
+
+    Shard `i` allocates ids `i + 1, i + 1 + SHARD_COUNT, ...`, which is what
+    `shard_for_id` relies on. Sequences already set up are left alone, so it
+    can run again; a sequence is only changed while its table is empty. The
+    carts' foreign key to products is dropped from the home database.
+
+    Args:
+        metadata (MetaData): The application metadata.
+        engines (dict): Sync engines by shard id, including the home shard.
+
+    Raises:
+        RuntimeError: If a table holding rows has a sequence that is not interleaved.
+    """
+    shard_meta = shard_metadata(metadata)
+    for shard_id, engine in engines.items():
+        if shard_id != HOME_SHARD:
+            shard_meta.create_all(bind=engine)
+        elif engine.dialect.name == "sqlite":
+            drop_sqlite_cart_foreign_key(metadata, engine)
+        if engine.dialect.name != "postgresql":
+            continue
+        with engine.begin() as conn:
+            if shard_id == HOME_SHARD:
+                conn.execute(
+                    text(
+                        "ALTER TABLE carts DROP CONSTRAINT IF EXISTS carts_product_id_fkey"
+                    )
+                )
+            start = int(shard_id) + 1
+            for table in SHARDED_TABLES:
+                sequence = conn.execute(
+                    text(
+                        "SELECT increment_by, start_value FROM pg_sequences "
+                        "WHERE sequencename = :name"
+                    ),
+                    {"name": f"{table}_id_seq"},
+                ).one()
+                if tuple(sequence) == (SHARD_COUNT, start):
+                    continue
+                if conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {table})")):
+                    raise RuntimeError(
+                        f"{table} on shard {shard_id} has rows; its ids are not "
+                        f"interleaved across {SHARD_COUNT} shards."
+                    )
+                conn.execute(
+                    text(
+                        f"ALTER SEQUENCE {table}_id_seq INCREMENT BY {SHARD_COUNT} "
+                        f"START WITH {start} RESTART WITH {start}"
+                    )
+                )
@@ -0,0 +1,155 @@
+# Slow query log with sampled EXPLAIN capture
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.query_stats import current_stats
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", os.path.join("logs", "slow_queries.log"))
+SLOW_QUERY_LOG_BYTES = int(os.getenv("SLOW_QUERY_LOG_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+EXPLAIN_PREFIX = {
+    "postgresql": "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ",
+    "sqlite": "EXPLAIN QUERY PLAN ",
+}
+# Dialects whose EXPLAIN runs the statement again, inside a savepoint.
+EXPLAIN_EXECUTES = {"postgresql"}
+
+logger = logging.getLogger("app.slow_query")
+
+
+def get_logger() -> logging.Logger:
+    """
+    Return the slow query logger, attaching the rotating file handler on first use.
+
+    Returns:
+        logging.Logger: Logger writing one JSON document per line.
+    """
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            SLOW_QUERY_LOG,
+            maxBytes=SLOW_QUERY_LOG_BYTES,
+            backupCount=SLOW_QUERY_LOG_BACKUPS,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def parameter_shape(parameters, executemany: bool):
+    """
+    Describe bound parameters by type only, so no user data reaches the log.
+
+    Args:
+        parameters: The parameters passed to the DBAPI cursor.
+        executemany (bool): Whether the statement ran with executemany.
+
+    Returns:
+        The parameter types, as a dict, list or summary of a batch.
+    """
+    if executemany:
+        return {
+            "rows": len(parameters),
+            "first": parameter_shape(parameters[0], False) if parameters else None,
+        }
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+def explain(conn, statement: str, parameters) -> list | str | None:
+    """
+    Capture the plan of a slow SELECT on the connection that ran it.
+
+    EXPLAIN ANALYZE runs the statement again, so it runs in a savepoint that
+    is rolled back; a failed EXPLAIN leaves the request's transaction usable.
+    Its statements are not counted in the request's query stats.
+
+    Args:
+        conn (Connection): The connection the statement ran on.
+        statement (str): The SQL string sent to the driver.
+        parameters: The parameters passed to the DBAPI cursor.
+
+    Returns:
+        list | str | None: The plan rows, or None when the statement is not explainable.
+    """
+    prefix = EXPLAIN_PREFIX.get(conn.dialect.name)
+    if not prefix or not statement.lstrip().upper().startswith("SELECT"):
+        return None
+    conn.info["explaining"] = True
+    savepoint = None
+    try:
+        if conn.dialect.name in EXPLAIN_EXECUTES:
+            savepoint = conn.begin_nested()
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+        return [list(row) if len(row) > 1 else row[0] for row in rows]
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        if savepoint is not None and savepoint.is_active:
+            savepoint.rollback()
+        conn.info["explaining"] = False
+
+
+def instrument_slow_queries(engine: Engine) -> None:
+    """
+    Log statements on an engine that run longer than SLOW_QUERY_MS.
+
+    Args:
+        engine (Engine): The sync engine (use `AsyncEngine.sync_engine` for async).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        """BEFORE CURSOR EXECUTE EVENT"""
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_slow_query(conn, cursor, statement, parameters, context, executemany):
+        """AFTER CURSOR EXECUTE EVENT"""
+        elapsed_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+        if elapsed_ms < SLOW_QUERY_MS or conn.info.get("explaining"):
+            return
+        stats = current_stats.get()
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(elapsed_ms, 3),
+            "route": stats.route if stats else None,
+            "statement": statement,
+            "parameters": parameter_shape(parameters, executemany),
+            "plan": None,
+        }
+        if not executemany and random.random() < SLOW_QUERY_EXPLAIN_RATE:
+            entry["plan"] = explain(conn, statement, parameters)
+        get_logger().info(json.dumps(entry, default=str))
+
+
+def read_slow_queries(limit: int = 50) -> list[dict]:
+    """
+    Read the most recent entries from the current slow query log file.
+
+    Args:
+        limit (int): The maximum number of entries to return.
+
+    Returns:
+        list[dict]: The newest entries, most recent first.
+    """
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG) as f:
+        lines = deque(f, maxlen=limit)
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
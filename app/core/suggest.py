@@ -0,0 +1,204 @@
+# Per-worker prefix index of product names for search-box suggestions
+import asyncio
+import os
+import threading
+from bisect import bisect_left, insort
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+from app.core.database import shard_engines
+from app.models.products import ProductModel
+
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "300"))
+# Entries looked at per lookup; bounds the cost when one product has many
+# words starting with the prefix.
+SUGGEST_SCAN_LIMIT = int(os.getenv("SUGGEST_SCAN_LIMIT", "256"))
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def name_keys(name: str) -> list[str]:
+    """Return the name from each word on, so any word can start a match."""
+    words = normalize(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class SuggestIndex:
+    """
+    Sorted arrays of (key, product id) with binary search for prefixes.
+
+    `starts` holds each normalized name; `words` holds it again from every
+    later word on, so "shoe" also finds "Red running shoes". Entries sharing
+    a prefix are contiguous, so a lookup is a bisect plus a scan of about
+    `limit` entries, and names starting with the prefix come first.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.starts: list[tuple[str, int]] = []
+        self.words: list[tuple[str, int]] = []
+        self.names: dict[int, str] = {}
+
+    def rebuild(self, products) -> None:
+        """Replace the index with the given (id, product_name) pairs."""
+        names = {product_id: name for product_id, name in products}
+        starts, words = [], []
+        for product_id, name in names.items():
+            keys = name_keys(name)
+            starts.extend((key, product_id) for key in keys[:1])
+            words.extend((key, product_id) for key in keys[1:])
+        starts.sort()
+        words.sort()
+        with self.lock:
+            self.starts, self.words, self.names = starts, words, names
+
+    def add(self, product_id: int, name: str) -> None:
+        with self.lock:
+            self._remove(product_id)
+            self.names[product_id] = name
+            keys = name_keys(name)
+            for key in keys[:1]:
+                insort(self.starts, (key, product_id))
+            for key in keys[1:]:
+                insort(self.words, (key, product_id))
+
+    def add_many(self, products) -> None:
+        """
+        Add (id, product_name) pairs, e.g. a bulk import. The new entries are
+        sorted once and merged into the arrays, instead of an insort each.
+        """
+        names = {product_id: name for product_id, name in products}
+        starts, words = [], []
+        for product_id, name in names.items():
+            keys = name_keys(name)
+            starts.extend((key, product_id) for key in keys[:1])
+            words.extend((key, product_id) for key in keys[1:])
+        starts.sort()
+        words.sort()
+        with self.lock:
+            for product_id in names:
+                self._remove(product_id)
+            self.names.update(names)
+            # Two sorted runs: the sort merges them in linear time.
+            self.starts = sorted(self.starts + starts)
+            self.words = sorted(self.words + words)
+
+    def remove(self, product_id: int) -> None:
+        with self.lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: int) -> None:
+        name = self.names.pop(product_id, None)
+        if name is None:
+            return
+        keys = name_keys(name)
+        for entries, entry_keys in ((self.starts, keys[:1]), (self.words, keys[1:])):
+            for key in entry_keys:
+                i = bisect_left(entries, (key, product_id))
+                if i < len(entries) and entries[i] == (key, product_id):
+                    del entries[i]
+
+    def suggest(self, prefix: str, limit: int) -> list[dict]:
+        """
+        Return up to `limit` products with a word starting with `prefix`:
+        names starting with it first, each group in alphabetical order.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found: dict[int, str] = {}
+        with self.lock:
+            for entries in (self.starts, self.words):
+                start = bisect_left(entries, (prefix,))
+                for i in range(start, min(start + SUGGEST_SCAN_LIMIT, len(entries))):
+                    key, product_id = entries[i]
+                    if len(found) >= limit or not key.startswith(prefix):
+                        break
+                    found.setdefault(product_id, self.names[product_id])
+        return [
+            {"product_id": product_id, "product_name": name}
+            for product_id, name in found.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+suggest_index = SuggestIndex()
+
+
+async def load_suggest_index() -> None:
+    """Build the index from the live products of every shard."""
+    products = []
+    for engine in shard_engines.values():
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                select(ProductModel.id, ProductModel.product_name).where(
+                    ProductModel.deleted_at.is_(None)
+                )
+            )
+            products.extend(result.all())
+    suggest_index.rebuild(products)
+
+
+async def suggest_refresh_loop() -> None:
+    """
+    Rebuild the index every SUGGEST_REFRESH_SECONDS, picking up the
+    changes committed by the other workers.
+    """
+    while True:
+        await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+        try:
+            await load_suggest_index()
+        except Exception as e:
+            print(f"Suggest index refresh failed: {e}")
+
+
+def queue_change(target: ProductModel) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("suggest_changes", {})[target.id] = (
+            None if target.deleted_at is not None else target.product_name
+        )
+
+
+@event.listens_for(ProductModel, "after_insert")
+def suggest_after_insert(mapper, connection, target) -> None:
+    """AFTER INSERT EVENT"""
+    queue_change(target)
+
+
+@event.listens_for(ProductModel, "after_update")
+def suggest_after_update(mapper, connection, target) -> None:
+    """AFTER UPDATE EVENT"""
+    state = inspect(target)
+    if (
+        state.attrs.product_name.history.has_changes()
+        or state.attrs.deleted_at.history.has_changes()
+    ):
+        queue_change(target)
+
+
+@event.listens_for(ProductModel, "after_delete")
+def suggest_after_delete(mapper, connection, target) -> None:
+    """AFTER DELETE EVENT"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("suggest_changes", {})[target.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def apply_suggest_changes(session) -> None:
+    """AFTER COMMIT EVENT"""
+    for product_id, name in session.info.pop("suggest_changes", {}).items():
+        if name is None:
+            suggest_index.remove(product_id)
+        else:
+            suggest_index.add(product_id, name)
+
+
+@event.listens_for(Session, "after_rollback")
+def drop_suggest_changes(session) -> None:
+    """AFTER ROLLBACK EVENT"""
+    session.info.pop("suggest_changes", None)
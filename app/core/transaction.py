@@ -0,0 +1,142 @@
+# Transactional unit of work with retries on serialization failures and deadlocks
+import asyncio
+import os
+import random
+import threading
+from typing import Awaitable, Callable, TypeVar
+from fastapi import HTTPException, status
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.sharding import SHARDING_ENABLED, SHARD_IDS
+
+T = TypeVar("T")
+
+# serialization_failure and deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+CHECKOUT_ISOLATION = os.getenv("DB_CHECKOUT_ISOLATION", "SERIALIZABLE")
+RETRY_ATTEMPTS = int(os.getenv("DB_RETRY_ATTEMPTS", "5"))
+RETRY_BACKOFF = float(os.getenv("DB_RETRY_BACKOFF", "0.02"))
+RETRY_BACKOFF_MAX = float(os.getenv("DB_RETRY_BACKOFF_MAX", "0.5"))
+# Each transaction earns this fraction of a retry, so retries stay a bounded
+# share of the load when contention is high.
+RETRY_BUDGET_RATIO = float(os.getenv("DB_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MAX = float(os.getenv("DB_RETRY_BUDGET_MAX", "50"))
+
+
+class RetryStats:
+    """Counters and retry budget shared by all units of work in the worker."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.commits = 0
+        self.retries = 0
+        self.aborts = 0
+        self.budget = RETRY_BUDGET_MAX
+
+    def start(self) -> None:
+        with self.lock:
+            self.transactions += 1
+            self.budget = min(self.budget + RETRY_BUDGET_RATIO, RETRY_BUDGET_MAX)
+
+    def take_retry(self) -> bool:
+        with self.lock:
+            if self.budget < 1:
+                return False
+            self.budget -= 1
+            self.retries += 1
+            return True
+
+    def as_dict(self) -> dict:
+        with self.lock:
+            return {
+                "transactions": self.transactions,
+                "commits": self.commits,
+                "retries": self.retries,
+                "aborts": self.aborts,
+                "retry_budget": round(self.budget, 2),
+            }
+
+
+retry_stats = RetryStats()
+
+
+def sqlstate(error: DBAPIError) -> str | None:
+    """
+    Extract the SQLSTATE code from a driver error (psycopg2 or asyncpg).
+
+    Args:
+        error (DBAPIError): The SQLAlchemy-wrapped driver error.
+
+    Returns:
+        str | None: The five character SQLSTATE, if the driver reported one.
+    """
+    orig = error.orig
+    for candidate in (orig, getattr(orig, "__cause__", None)):
+        code = getattr(candidate, "sqlstate", None) or getattr(
+            candidate, "pgcode", None
+        )
+        if code:
+            return code
+    return None
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given attempt number."""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2**attempt))
+
+
+async def run_in_transaction(
+    db: AsyncSession,
+    work: Callable[[], Awaitable[T]],
+    isolation_level: str = CHECKOUT_ISOLATION,
+) -> T:
+    """
+    Run `work` in its own transaction, retrying serialization failures and deadlocks.
+
+    `work` must load everything it needs itself, because a rollback expires
+    every object in the session. It is expected to commit.
+
+    Args:
+        db (AsyncSession): The database session.
+        work (Callable): Coroutine function performing the reads and writes.
+        isolation_level (str): The isolation level for the transaction.
+
+    Returns:
+        The value returned by `work`.
+
+    Raises:
+        HTTPException: 409 when the transaction keeps conflicting and the
+                       attempts or the retry budget are used up.
+    """
+    if db.in_transaction():
+        # Isolation can only be chosen before the first statement.
+        await db.commit()
+    retry_stats.start()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            for bind_arguments in (
+                [{"shard_id": s} for s in SHARD_IDS] if SHARDING_ENABLED else [None]
+            ):
+                await db.connection(
+                    bind_arguments=bind_arguments,
+                    execution_options={"isolation_level": isolation_level},
+                )
+            result = await work()
+            with retry_stats.lock:
+                retry_stats.commits += 1
+            return result
+        except DBAPIError as e:
+            await db.rollback()
+            if sqlstate(e) not in RETRYABLE_SQLSTATES:
+                raise
+            if attempt >= RETRY_ATTEMPTS or not retry_stats.take_retry():
+                with retry_stats.lock:
+                    retry_stats.aborts += 1
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Too many concurrent orders for this product. Please retry.",
+                )
+            await asyncio.sleep(backoff(attempt))
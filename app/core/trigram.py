@@ -0,0 +1,58 @@
+# Trigram similarity for fuzzy product search
+import os
+import re
+
+# Minimum word similarity for a fuzzy match; lower finds worse misspellings
+# but matches, and ranks, more products.
+FUZZY_THRESHOLD = float(os.getenv("PRODUCT_FUZZY_THRESHOLD", "0.4"))
+
+
+def trigrams(text: str) -> set[str]:
+    """Return the trigrams of every word, padded like pg_trgm pads them."""
+    grams = set()
+    for word in re.findall(r"[^\W_]+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(query: str | None, text: str | None) -> float | None:
+    """
+    Share of the query's trigrams that also occur in the text.
+
+    Stands in for pg_trgm's word_similarity() on SQLite. pg_trgm compares
+    against the best matching run of words only, so its scores can be
+    lower, but both are 1 when the text contains the query.
+    """
+    if query is None or text is None:
+        return None
+    wanted = trigrams(query)
+    if not wanted:
+        return 0.0
+    return len(wanted & trigrams(text)) / len(wanted)
+
+
+def set_trigram_threshold(conn, clauseelement, multiparams, params, execution_options):
+    """
+    BEFORE EXECUTE EVENT
+
+    PostgreSQL's indexed <% operator reads its threshold from a setting. It
+    is set with SET LOCAL in the transaction of each fuzzy search, marked
+    with the `fuzzy_search` execution option: a session-level SET would not
+    follow the transaction to another server connection behind a pooler
+    such as PgBouncer.
+    """
+    options = dict(execution_options)
+    if hasattr(clauseelement, "get_execution_options"):
+        options.update(clauseelement.get_execution_options())
+    if options.get("fuzzy_search"):
+        conn.exec_driver_sql(
+            f"SET LOCAL pg_trgm.word_similarity_threshold = {FUZZY_THRESHOLD}"
+        )
+
+
+def register_word_similarity(dbapi_connection, connection_record) -> None:
+    """Make word_similarity() callable from SQL on SQLite."""
+    dbapi_connection.create_function(
+        "word_similarity", 2, word_similarity, deterministic=True
+    )
@@ -1,18 +1,62 @@
 from app.models.products import ProductModel
+from app.models.carts import CartModel
 from fastapi import HTTPException, status
 from app.schemas.product_schema import UpdateProductDetails
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.core.cache import product_cache, invalidate_on_commit, invalidate_listings
+from datetime import datetime, timezone
 import os
 
 
-def add_product(product_detail: ProductModel, image_path, id: int, db: Session):
+async def get_product(
+    product_id: int, db: AsyncSession, exact: bool = False
+) -> ProductModel | None:
+    """
+    Returns a product by id, from the product cache when possible.
+
+    Cached rows can be up to PRODUCT_CACHE_TTL seconds old. Callers that
+    change the product or need the exact stock pass `exact=True`, which
+    reads the row from the database and refreshes the cache.
+
+    Args:
+        product_id (int): The ID of the product.
+        db (AsyncSession): The database session.
+        exact (bool): Whether to bypass the cache.
+
+    Returns:
+        ProductModel | None: The product attached to the session, or None if it doesn't exist.
+    """
+    if not exact:
+        cached = product_cache.get(product_id)
+        if cached is not None:
+            row, identity_token = cached
+            data = ProductModel(**row)
+            make_transient_to_detached(data)
+            if identity_token is not None:
+                inspect(data).key = inspect(ProductModel).identity_key_from_primary_key(
+                    [product_id], identity_token=identity_token
+                )
+            return await db.merge(data, load=False)
+    data = await db.get(ProductModel, product_id, populate_existing=exact)
+    if data is not None:
+        state = inspect(data)
+        row = {attr.key: getattr(data, attr.key) for attr in state.mapper.column_attrs}
+        product_cache.set(product_id, (row, state.identity_token))
+    return data
+
+
+async def add_product(
+    product_detail: ProductModel, image_path, id: int, db: AsyncSession
+):
     """
     Adds a new product to the database.
 
     Args:
         product_detail (ProductModel): The product details to be added.
         id (int): The owner's ID.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing a success message and the product details.
@@ -32,11 +76,13 @@ def add_product(product_detail: ProductModel, image_path, id: int, db: Session):
             image_path=image_path,
         )
         db.add(data)
-        db.commit()
-        db.refresh(data)
+        await db.flush()
+        invalidate_listings(db.sync_session, data.id, (data.price,))
+        await db.commit()
+        await db.refresh(data)
         return {"message": "Product added successfully", "Product Details": data}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         if os.path.exists(image_path):
             os.remove(image_path)
         raise HTTPException(
@@ -45,11 +91,11 @@ def add_product(product_detail: ProductModel, image_path, id: int, db: Session):
         )
 
 
-def update_product_info(
+async def update_product_info(
     product_detail: UpdateProductDetails,
     image_path: str | None,
     data: ProductModel,
-    db: Session,
+    db: AsyncSession,
 ):
     """
     Updates a product in the database.
@@ -58,7 +104,7 @@ def update_product_info(
         product_detail (UpdateProductDetails): The product details to be updated.
         image_path (str|None): The path of the new image file, if any.
         data (ProductModel): The existing product model to be updated.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing a success message and the updated product details.
@@ -69,6 +115,11 @@ def update_product_info(
     """
 
     old_image_path = None
+    # A new name or price can move the product between listing pages.
+    old_price = data.price
+    moved = bool(product_detail.product_name) or (
+        product_detail.price is not None and product_detail.price >= 0
+    )
     if product_detail.product_name:
         data.product_name = product_detail.product_name
     if product_detail.price is not None and product_detail.price >= 0:
@@ -81,15 +132,19 @@ def update_product_info(
         )
         data.image_path = image_path
     try:
-        db.commit()
-        db.refresh(data)
+        invalidate_on_commit(db.sync_session, product_cache, data.id)
+        invalidate_listings(
+            db.sync_session, data.id, (old_price, data.price) if moved else ()
+        )
+        await db.commit()
+        await db.refresh(data)
         if old_image_path and os.path.exists(old_image_path):
             try:
                 os.remove(old_image_path)
             except Exception as e:
                 print("Cannot delete image.")
     except Exception:
-        db.rollback()
+        await db.rollback()
         if image_path and os.path.exists(image_path):
             os.remove(image_path)
         raise HTTPException(
@@ -99,13 +154,19 @@ def update_product_info(
     return {"message": "Product details updated successfully", "data": data}
 
 
-def delete_product_info(product_detail: ProductModel, db: Session) -> dict[str, str]:
+async def delete_product_info(
+    product_detail: ProductModel, db: AsyncSession
+) -> dict[str, str]:
     """
-    Deletes a product from the database.
+    Soft-deletes a product.
+
+    The product is hidden from listings, carts and ordering at once and
+    removed from the user's carts. The row and its image are removed later
+    by the background purge (`app.core.purge`).
 
     Args:
         product_detail (ProductModel): The product details to be deleted.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing a success message.
@@ -116,21 +177,16 @@ def delete_product_info(product_detail: ProductModel, db: Session) -> dict[str,
     """
 
     try:
-        image_path = (
-            product_detail.image_path.replace("/", os.sep)
-            if product_detail.image_path
-            else None
+        invalidate_on_commit(db.sync_session, product_cache, product_detail.id)
+        invalidate_listings(db.sync_session, product_detail.id, (product_detail.price,))
+        product_detail.deleted_at = datetime.now(timezone.utc)
+        await db.execute(
+            delete(CartModel).where(CartModel.product_id == product_detail.id)
         )
-        db.delete(product_detail)
-        db.commit()
-        if image_path and os.path.exists(image_path):
-            try:
-                os.remove(image_path)
-            except Exception as e:
-                print("Cannot delete image.")
+        await db.commit()
         return {"message": "product deleted Successfully"}
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal Server Error",
@@ -1,11 +1,21 @@
 from app.models.users import UserModel
-from app.core.security import hash_pwd
-from fastapi import HTTPException, status, Response
+from app.models.carts import CartModel
+from app.models.orders import OrderModel
+from app.models.products import ProductModel
+from app.core.database import shard_sync_engines
+from app.core.cache import product_cache, invalidate_on_commit, invalidate_listings
+from app.core.purge import remove_images
+from app.core.security import hash_pwd, invalidate_user, REFRESH_TOKEN_EXPIRE
+from app.core.revocation import revocations
+from fastapi import BackgroundTasks, HTTPException, status, Response
 
 # from fastapi.responses import JSONResponse
 from app.schemas.user_schema import UserResponse, UserRegister
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
 
 
 def add_user(user: UserRegister, db: Session) -> UserResponse:
@@ -62,6 +72,7 @@ def update_users(user, data, db):
             data.email = user.email
         if user.password:
             data.password = hash_pwd(user.password)
+        invalidate_user(db, data.id)
         db.commit()
         db.refresh(data)
         return UserResponse(name=data.name, email=data.email)
@@ -73,15 +84,103 @@ def update_users(user, data, db):
         )
 
 
+def update_password_hash(data: UserModel, hashed_pwd: str, db: Session) -> None:
+    """
+    Replace a user's password hash after a rehash on login.
+
+    A failure only means the old hash stays in place until the next login,
+    so it never fails the login itself.
+
+    Args:
+        data (UserModel): The user model instance to update.
+        hashed_pwd (str): The new password hash.
+        db (Session): The database session to use for the operation.
+    """
+    try:
+        data.password = hashed_pwd
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Cannot update password hash: {e}")
+
+
+def release_user_products(db: Session | Connection, user_id: int) -> tuple[list, list]:
+    """
+    Prepare one database for the removal of a user's products and orders.
+
+    The stock of the user's orders is given back to the products, and other
+    users' orders are detached from the user's products.
+
+    Args:
+        db (Session | Connection): The session or connection of the database.
+        user_id (int): The ID of the user being deleted.
+
+    Returns:
+        tuple[list, list]: The user's products (id, price, image_path) and the
+        ids of the products the user ordered.
+    """
+    products = db.execute(
+        select(ProductModel.id, ProductModel.price, ProductModel.image_path)
+        .where(ProductModel.owner_id == user_id)
+        .execution_options(include_deleted=True)
+    ).all()
+    product_ids = [row.id for row in products]
+    ordered_ids = (
+        db.execute(
+            select(OrderModel.product_id)
+            .where(OrderModel.owner_id == user_id, OrderModel.product_id.is_not(None))
+            .distinct()
+        )
+        .scalars()
+        .all()
+    )
+    if ordered_ids:
+        ordered_quantity = (
+            select(func.sum(OrderModel.quantity))
+            .where(
+                OrderModel.product_id == ProductModel.id,
+                OrderModel.owner_id == user_id,
+            )
+            .scalar_subquery()
+        )
+        db.execute(
+            update(ProductModel)
+            .where(ProductModel.id.in_(ordered_ids))
+            .values(stock=ProductModel.stock + ordered_quantity)
+            .execution_options(synchronize_session=False)
+        )
+    if product_ids:
+        db.execute(
+            update(OrderModel)
+            .where(OrderModel.product_id.in_(product_ids))
+            .values(product_id=None)
+            .execution_options(synchronize_session=False)
+        )
+    return list(products), list(ordered_ids)
+
+
 def delete_users(
-    user_data: UserModel, response: Response, db: Session
+    user_data: UserModel,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session,
 ) -> dict[str, str]:
     """
     Delete a user from the database.
 
+    The user's products, cart rows and orders are removed by the ON DELETE
+    CASCADE foreign keys rather than loaded and deleted one by one. Before
+    that, the stock of the user's orders is restored, other users' carts and
+    orders are detached from the user's products, all with set-based
+    statements. On the extra shards, which have no foreign keys, the user's
+    products and orders are deleted by the same statements. The user's
+    refresh tokens are revoked, and product images are removed after the
+    response is sent.
+
     Args:
         user_data (UserModel): The user model instance to delete.
         response (Response): The response object to delete the access token cookie.
+        background_tasks (BackgroundTasks): Runs the image cleanup after the response.
         db (Session): The database session to use for the operation.
 
     Returns:
@@ -93,9 +192,43 @@ def delete_users(
     """
 
     try:
+        user_id = user_data.id
+        products, ordered_ids = release_user_products(db, user_id)
+        # The extra shards have no foreign keys, so nothing cascades there.
+        # They are cleaned up first: if the primary then fails, deleting the
+        # user again finishes the job instead of leaving orphaned rows.
+        for shard_engine in shard_sync_engines.values():
+            with shard_engine.begin() as conn:
+                shard_products, shard_ordered_ids = release_user_products(conn, user_id)
+                conn.execute(delete(OrderModel).where(OrderModel.owner_id == user_id))
+                conn.execute(
+                    delete(ProductModel).where(ProductModel.owner_id == user_id)
+                )
+            products += shard_products
+            ordered_ids += shard_ordered_ids
+        product_ids = [row.id for row in products]
+        if product_ids:
+            db.execute(
+                delete(CartModel)
+                .where(CartModel.product_id.in_(product_ids))
+                .execution_options(synchronize_session=False)
+            )
+        for product_id in {*ordered_ids, *product_ids}:
+            invalidate_on_commit(db, product_cache, product_id)
+        for product_id in ordered_ids:
+            invalidate_listings(db, product_id)
+        for row in products:
+            invalidate_listings(db, row.id, (row.price,))
+        invalidate_user(db, user_id, deleted=True)
         db.delete(user_data)
         db.commit()
+        expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE)
+        revocations.revoke_user(db, user_id, expires_at)
+        image_paths = [row.image_path for row in products if row.image_path]
+        if image_paths:
+            background_tasks.add_task(remove_images, image_paths)
         response.delete_cookie("access_token")
+        response.delete_cookie("refresh_token")
         return {"message": "User Deleted Successfully."}
     except OperationalError as e:
         db.rollback()
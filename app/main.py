@@ -4,8 +4,27 @@ from app.routes.products_route import router as ProductRouter
 from app.routes.admin_route import router as AdminRouter
 from app.routes.cart_route import router as CartRouter
 from app.routes.order_route import router as OrderRouter
+from app.core.query_stats import query_stats_middleware
+from app.core.purge import PURGE_ENABLED, activity_middleware, purge_loop
+from app.core.suggest import load_suggest_index, suggest_refresh_loop
+from contextlib import asynccontextmanager
+import asyncio
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    purge_task = asyncio.create_task(purge_loop()) if PURGE_ENABLED else None
+    await load_suggest_index()
+    suggest_task = asyncio.create_task(suggest_refresh_loop())
+    yield
+    suggest_task.cancel()
+    if purge_task:
+        purge_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
+app.middleware("http")(query_stats_middleware)
+app.middleware("http")(activity_middleware)
 
 
 app.include_router(UserRouter, prefix="/users", tags=["Users Routes."])
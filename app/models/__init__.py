@@ -1,3 +1,3 @@
-from app.models import carts, orders, products, users
+from app.models import carts, orders, products, users, revoked_tokens, change_versions
 from app.models.users import UserModel
 from app.models.carts import CartModel
@@ -1,12 +1,31 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import (
+    Column,
+    Integer,
+    ForeignKey,
+    ForeignKeyConstraint,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 from app.core.database import Base
+from app.core.sharding import SHARDING_ENABLED
+
+
+def products_share_database(ddl, target, bind, **kw) -> bool:
+    # Sharded products can live in another database than the carts.
+    return not SHARDING_ENABLED
 
 
 class CartModel(Base):
     __tablename__ = "carts"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "product_id", name="uq_carts_owner_id_product_id"),
+        ForeignKeyConstraint(
+            ["product_id"], ["products.id"], name="carts_product_id_fkey"
+        ).ddl_if(callable_=products_share_database),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer)
     quantity = Column(Integer, nullable=False)
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
 
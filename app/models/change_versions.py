@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.database import Base
+
+
+class ChangeVersionModel(Base):
+    __tablename__ = "change_versions"
+    # A counter per cached view ("products", "cart:<user id>", ...), bumped
+    # after every commit that changes what the view returns.
+    scope = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
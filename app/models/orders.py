@@ -8,8 +8,9 @@ from sqlalchemy import (
     Enum as SqlEnum,
 )
 from enum import Enum
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, object_session
 from sqlalchemy.orm import relationship
+from app.core.cache import product_cache, invalidate_on_commit, invalidate_listings
 from app.core.database import Base
 from app.models.products import ProductModel
 
@@ -27,8 +28,8 @@ class OrderModel(Base):
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
     seller_name = Column(String, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
-    product_id = Column(Integer, ForeignKey("products.id"))
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     status = Column(SqlEnum(OrderStatus), default=OrderStatus.PENDING)
 
     ownerorder = relationship("UserModel", back_populates="order")
@@ -45,6 +46,8 @@ def restore_stock_before_delete(mapper, connection, target) -> None:
     if product:
         product.stock += target.quantity
         session.flush()
+        invalidate_on_commit(object_session(target), product_cache, product.id)
+        invalidate_listings(object_session(target), product.id)
 
 
 @event.listens_for(OrderModel, "before_insert")
@@ -59,3 +62,5 @@ def update_stock_before_insert(mapper, connection, target) -> None:
 
         product.stock -= target.quantity
         session.flush()
+        invalidate_on_commit(object_session(target), product_cache, product.id)
+        invalidate_listings(object_session(target), product.id)
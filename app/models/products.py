@@ -1,20 +1,124 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, FLOAT, event
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy import (
+    DDL,
+    Column,
+    Integer,
+    String,
+    ForeignKey,
+    FLOAT,
+    DateTime,
+    Index,
+    event,
+    text,
+)
+from sqlalchemy.orm import relationship, Session, with_loader_criteria
 from app.core.database import Base
 
+LIVE = text("deleted_at IS NULL")
+DELETED = text("deleted_at IS NOT NULL")
+
 
 class ProductModel(Base):
     __tablename__ = "products"
+    # Catalog indexes only cover live rows, so soft-deleted products cost
+    # nothing there and a deleted product's name can be reused by its seller.
+    __table_args__ = (
+        Index(
+            "uq_products_live_owner_id_product_name",
+            "owner_id",
+            "product_name",
+            unique=True,
+            postgresql_where=LIVE,
+            sqlite_where=LIVE,
+        ),
+        # (price, id) is the listing's ORDER BY and cursor position.
+        Index(
+            "ix_products_live_price_id",
+            "price",
+            "id",
+            postgresql_where=LIVE,
+            sqlite_where=LIVE,
+        ),
+        Index(
+            "ix_products_deleted_at",
+            "deleted_at",
+            postgresql_where=DELETED,
+            sqlite_where=DELETED,
+        ),
+    )
     id = Column(Integer, primary_key=True)
     product_name = Column(String, nullable=False)
     stock = Column(Integer, nullable=False)
     price = Column(FLOAT, nullable=False)
     description = Column(String, nullable=True)
     owner_id = Column(
-        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
     image_path = Column(String, nullable=True)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
 
     admin = relationship("UserModel", back_populates="admin_id")
     cart = relationship("CartModel", back_populates="product")
     orderproduct = relationship("OrderModel", back_populates="product")
+
+
+# Full-text search lives outside the mapped columns because it differs per
+# database: PostgreSQL gets a generated tsvector column with a GIN index,
+# SQLite an FTS5 table kept in sync by triggers. PostgreSQL also gets the
+# trigram index of fuzzy search; SQLite scans with app.core.trigram.
+SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(product_name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)",
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX ix_products_live_name_trgm ON products "
+        "USING gin (product_name gin_trgm_ops) WHERE deleted_at IS NULL",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE products_fts USING fts5(product_name, description, "
+        "content='products', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, product_name, description) "
+        "VALUES (new.id, new.product_name, new.description); END",
+        "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name, description) "
+        "VALUES ('delete', old.id, old.product_name, old.description); END",
+        "CREATE TRIGGER products_fts_update "
+        "AFTER UPDATE OF product_name, description ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name, description) "
+        "VALUES ('delete', old.id, old.product_name, old.description); "
+        "INSERT INTO products_fts(rowid, product_name, description) "
+        "VALUES (new.id, new.product_name, new.description); END",
+    ],
+}
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(
+            ProductModel.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect=dialect),
+        )
+event.listen(
+    ProductModel.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"),
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_deleted_products(orm_execute_state) -> None:
+    """ORM EXECUTE EVENT"""
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            with_loader_criteria(
+                ProductModel,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True,
+            )
+        )
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, func
+from app.core.database import Base
+
+
+class RevokedTokenModel(Base):
+    __tablename__ = "revoked_tokens"
+    # A refresh token's jti once it has been rotated, or a whole token family.
+    token_id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), index=True
+    )
@@ -12,11 +12,20 @@ class UserModel(Base):
     role = Column(String, nullable=False, default="user")
 
     admin_id = relationship(
-        "ProductModel", back_populates="admin", cascade="all, delete-orphan"
+        "ProductModel",
+        back_populates="admin",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     cart = relationship(
-        "CartModel", back_populates="owner", cascade="all, delete-orphan"
+        "CartModel",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     order = relationship(
-        "OrderModel", back_populates="ownerorder", cascade="all, delete-orphan"
+        "OrderModel",
+        back_populates="ownerorder",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
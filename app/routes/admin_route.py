@@ -1,9 +1,26 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Response
+from fastapi import (
+    APIRouter,
+    Depends,
+    status,
+    HTTPException,
+    Request,
+    Response,
+    Query,
+)
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_db, engine, async_engine, replica_engines
+from app.core.cache import cache_stats
+from app.core.hashing import hashing_pool
+from app.core.revocation import revocations
+from app.core.pool import pool_status
+from app.core.rate_limit import throttle_login, throttle_stats
+from app.core.slow_query import read_slow_queries
+from app.core.transaction import retry_stats
 from app.schemas.user_schema import AdminSchema, UserLogin
 from app.services.admin_services import register_admin, login_admin
-from app.core.security import is_logged_in
+from app.core.security import is_logged_in, get_current_user, auth_sources
+from app.models.users import UserModel
+from app.routes.products_route import check_admin
 
 router = APIRouter()
 
@@ -44,6 +61,7 @@ def add_admin(
 @router.post("/login")
 def login_admin_account(
     admin_info: UserLogin,
+    request: Request,
     response: Response,
     _: None = Depends(is_logged_in),
     db: Session = Depends(get_db),
@@ -53,6 +71,7 @@ def login_admin_account(
 
     Args:
         admin_info (UserLogin): The admin's login credentials.
+        request (Request): The HTTP request, for the client address.
         response (Response): The response object to set the access token.
         _ (None): A dependency check to ensure the user is not logged in.
         db (Session): The database session.
@@ -62,10 +81,151 @@ def login_admin_account(
 
     Raises:
         HTTPException: If the fields are empty, a 400 status code is raised with a detail message.
+                       If the account or the client made too many attempts, a 429 status code is raised.
     """
     if not admin_info.email or not admin_info.password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Fields should not be empty.",
         )
+    throttle_login(request, admin_info.email)
     return login_admin(admin_info, response, db)
+
+
+@router.get("/db/pool")
+def database_pool_stats(user: UserModel = Depends(get_current_user)):
+    """
+    Reports the live state of the sync, async and replica connection pools.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: Checked-out, idle and overflow connections and checkout wait times per pool.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+        "replicas": [pool_status(e.sync_engine) for e in replica_engines],
+    }
+
+
+@router.get("/db/slow-queries")
+def slow_queries(
+    limit: int = Query(50, gt=0, le=1000),
+    user: UserModel = Depends(get_current_user),
+):
+    """
+    Returns the most recent entries of the slow query log.
+
+    Args:
+        limit (int): The maximum number of entries to return. Defaults to 50.
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        list[dict]: Statement, parameter types, route, duration and sampled plan per entry.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return read_slow_queries(limit)
+
+
+@router.get("/db/retries")
+def transaction_retry_stats(user: UserModel = Depends(get_current_user)):
+    """
+    Reports retry and abort counters of the checkout transactions.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: Transactions, commits, retries, aborts and the remaining retry budget.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return retry_stats.as_dict()
+
+
+@router.get("/cache")
+def cache_statistics(user: UserModel = Depends(get_current_user)):
+    """
+    Reports size, hit and miss counters of the in-process caches.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: Size, hits, misses, hit ratio, evictions and invalidations per cache,
+        and how often the current user came from the cache, the token claims
+        or the database.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return {**cache_stats(), "auth_sources": dict(auth_sources)}
+
+
+@router.get("/auth/hashing")
+def password_hashing_stats(user: UserModel = Depends(get_current_user)):
+    """
+    Reports the bcrypt cost and the load of the password hashing pool.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: Cost, worker and queue limits, completed and rejected hashes.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return hashing_pool.as_dict()
+
+
+@router.get("/auth/throttle")
+def login_throttle_stats(user: UserModel = Depends(get_current_user)):
+    """
+    Reports the login attempt limits and how many attempts were refused.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: The counter store, the limit and window per scope, and the
+        allowed and refused attempts.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return throttle_stats()
+
+
+@router.get("/auth/revocations")
+def revocation_stats(user: UserModel = Depends(get_current_user)):
+    """
+    Reports the size of the refresh token revocation filter and how often it
+    let a check skip the database.
+
+    Args:
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: Filter entries, bits and hash count; checks, filter hits that were
+        confirmed in the database, and false positives.
+
+    Raises:
+        HTTPException: If the user is not an admin.
+    """
+    check_admin(user.role)
+    return revocations.as_dict()
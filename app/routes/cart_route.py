@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, status, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.cart_schema import CartDetails
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.database import get_async_db
+from app.core.security import get_async_current_user
+from app.core.etag import cache_headers, cart_scopes, not_modified
 from app.models.users import UserModel
 from app.models.products import ProductModel
 from app.models.orders import OrderModel
@@ -22,11 +23,11 @@ router = APIRouter()
 
 
 @router.post("/add/{product_id}")
-def add_cart_product(
+async def add_cart_product(
     product_id: int,
     cart: CartDetails,
-    db: Session = Depends(get_db),
-    user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: UserModel = Depends(get_async_current_user),
 ):
     """
     Adds a product to the user's cart.
@@ -34,7 +35,7 @@ def add_cart_product(
     Args:
         product_id (int): The id of the product to be added.
         cart (CartDetails): The quantity of the product to be added.
-        db (Session): The database connection.
+        db (AsyncSession): The database connection.
         user (UserModel): The user model object.
 
     Returns:
@@ -42,25 +43,38 @@ def add_cart_product(
     """
     check_user(user.role)
 
-    return validate_and_add_to_cart(user, cart.quantity, product_id, db)
+    return await validate_and_add_to_cart(user, cart.quantity, product_id, db)
 
 
 @router.get("/get", response_model=CartResponse)
-def get_cart_items(
-    user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
+async def get_cart_items(
+    request: Request,
+    response: Response,
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Returns the user's cart items and the total price of the items in the cart.
 
+    Responses carry an ETag; sending it back in If-None-Match gets a 304
+    until the cart or a product changes.
+
     Args:
+        request (Request): The incoming request.
+        response (Response): The response to set the validator headers on.
         user (UserModel): The user model object.
-        db (Session): The database connection.
+        db (AsyncSession): The database connection.
 
     Returns:
         CartResponse: The cart items and the total price of the items in the cart.
     """
     check_user(user.role)
-    data = cart_details(user, db)
+    headers = await cache_headers(db, cart_scopes(user.id), private=True)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    data = await cart_details(user, db)
     cart_items = [
         CartOut(
             product_id=item.product_id,
@@ -79,11 +93,11 @@ def get_cart_items(
 
 
 @router.put("/update/{product_id}")
-def update_cart_items(
+async def update_cart_items(
     product_id: int,
     new_quantity: int,
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Updates the quantity of a product in the user's cart.
@@ -92,21 +106,21 @@ def update_cart_items(
         product_id (int): The id of the product to be updated.
         new_quantity (int): The new quantity of the product.
         user (UserModel): The user model object.
-        db (Session): The database connection.
+        db (AsyncSession): The database connection.
 
     Returns:
         CartModel: The updated product's row in the cart table.
     """
     check_user(user.role)
 
-    return update_cart(user, product_id, new_quantity, db)
+    return await update_cart(user, product_id, new_quantity, db)
 
 
 @router.delete("/delete/{product_id}")
-def delete_cart_item(
+async def delete_cart_item(
     product_id: int,
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Deletes a product from the user's cart.
@@ -114,31 +128,32 @@ def delete_cart_item(
     Args:
         product_id (int): The id of the product to be deleted.
         user (UserModel): The user model object.
-        db (Session): The database connection.
+        db (AsyncSession): The database connection.
 
     Returns:
         dict: A dictionary containing a success message.
     """
     check_user(user.role)
-    return delete_cart_item_details(user, product_id, db)
+    return await delete_cart_item_details(user, product_id, db)
 
 
 @router.post("/order")
-def order_cart_items(
-    user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
+async def order_cart_items(
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Places an order for all items currently in the user's cart.
 
     Args:
         user (UserModel): The user model object.
-        db (Session): The database connection.
+        db (AsyncSession): The database connection.
 
     Returns:
         dict: A dictionary with order details and a list of unavailable products.
     """
 
-    data = cart_details(user, db)
+    data = await cart_details(user, db)
     product_ids = [item.product_id for item in data]
 
-    return cart_order_items(product_ids, user, db)
+    return await cart_order_items(product_ids, user, db)
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import get_current_user
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import get_async_current_user
+from app.core.etag import cache_headers, not_modified, order_scopes
 from app.models.users import UserModel
 from app.models.orders import OrderModel
 from app.services.order_services import check_order_details, delete_order_details
@@ -12,22 +14,35 @@ router = APIRouter()
 
 
 @router.get("/all", response_model=List[OrderOutput])
-def get_all_order(
-    user: UserModel = Depends(get_current_user), db: Session = Depends(get_db)
+async def get_all_order(
+    request: Request,
+    response: Response,
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Retrieve all orders for the current user.
 
+    Responses carry an ETag; sending it back in If-None-Match gets a 304
+    until the user's orders change.
+
     Args:
+        request (Request): The incoming request.
+        response (Response): The response to set the validator headers on.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         List[OrderOutput]: A list of orders with details such as order ID, product name,
         price, quantity, seller name, status, and total price.
     """
-
-    data = db.query(OrderModel).filter(OrderModel.owner_id == user.id).all()
+    headers = await cache_headers(db, order_scopes(user.id), private=True)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    result = await db.execute(select(OrderModel).filter(OrderModel.owner_id == user.id))
+    data = result.scalars().all()
 
     return [
         OrderOutput(
@@ -44,11 +59,11 @@ def get_all_order(
 
 
 @router.post("/add/{product_id}")
-def order_product(
+async def order_product(
     product_id: int,
     order: OrderDetails,
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Place an order for a product.
@@ -57,19 +72,19 @@ def order_product(
         product_id (int): The id of the product to be ordered.
         order (OrderDetails): The details of the order with the quantity.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary with the order details, including the order ID, product name, price, quantity, seller name, status, and total price.
     """
-    return check_order_details(product_id, order.quantity, user, db)
+    return await check_order_details(product_id, order.quantity, user, db)
 
 
 @router.delete("/cancel/{order_id}")
-def delete_order(
+async def delete_order(
     order_id: int,
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Cancel an order based on the order ID.
@@ -77,9 +92,9 @@ def delete_order(
     Args:
         order_id (int): The id of the order to be cancelled.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary with a success message.
     """
-    return delete_order_details(order_id, user, db)
+    return await delete_order_details(order_id, user, db)
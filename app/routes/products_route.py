@@ -4,18 +4,33 @@ from fastapi import (
     HTTPException,
     status,
     Query,
+    Request,
+    Response,
     UploadFile,
     File,
     Form,
 )
-from sqlalchemy import or_, and_, asc, desc
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
-from app.schemas.product_schema import ProductDetails, ProductOut, UpdateProductDetails
-from app.core.database import get_db
-from app.services.product_services import add_products, update_product, delete_product
-from app.models.products import ProductModel
-from app.core.security import get_current_user
+from app.schemas.product_schema import (
+    ProductDetails,
+    ProductFacets,
+    ProductOut,
+    ProductSuggestion,
+    UpdateProductDetails,
+)
+from app.core.database import get_async_db
+from app.services.product_services import (
+    add_products,
+    bulk_import_products,
+    update_product,
+    delete_product,
+)
+from app.services.catalog_services import list_products, product_facets
+from app.core.suggest import suggest_index
+from app.core.etag import CATALOG_SCOPES, cache_headers, not_modified
+from fastapi.responses import JSONResponse
+from app.core.security import get_async_current_user
 from app.models.users import UserModel
 from typing import List, Optional
 from pydantic import ValidationError
@@ -60,101 +75,130 @@ def validate_fields(product_name: str, price: float, stock: int):
         )
 
 
-def price_filter(min_price: float | None, max_price: float | None, query: Session):
-    """
-    Filters the products based on their price.
-
-    Args:
-        min_price (float|None): The minimum price.
-        max_price (float|None): The maximum price.
-        query (Session): The database query.
-
-    Returns:
-        Session: The filtered database query.
-
-    Raises:
-        HTTPException: If the minimum price is greater than the maximum price.
+@router.get("/all", response_model=List[ProductOut])
+async def get_all_product(
+    request: Request,
+    search: Optional[str] = None,
+    search_mode: str = Query("substring", regex="^(fulltext|fuzzy|substring)$"),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = Query(None, regex="^(price_asc|price_desc)$"),
+    limit: int = Query(10, gt=0),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    if min_price is not None:
-        query = query.filter(ProductModel.price >= min_price)
-    if max_price is not None:
-        query = query.filter(ProductModel.price <= max_price)
-    if min_price is not None and max_price is not None and min_price == max_price:
-        query = query.filter(ProductModel.price == min_price)
-    if min_price is not None and max_price is not None and min_price > max_price:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Minimum price cannot be greater than maximum price.",
-        )
-    return query
+    Retrieve a list of products that match the given criteria.
 
+    By default a search matches any part of the name and description. The
+    opt-in fulltext mode matches whole words, best match first unless
+    `sort_by` is given; the fuzzy mode tolerates misspelled product names
+    and ranks by similarity. When there are more products, the response carries
+    an X-Next-Cursor header; pass it back as `cursor` for the next page.
+    Unlike `offset`, a cursor stays fast however deep the page is.
 
-def sort_filter(sort_by: str, query):
-    """
-    Sorts the products based on the given criteria.
+    Responses carry an ETag that changes with any product change; sending
+    it back in If-None-Match gets a 304 without running the listing query.
 
     Args:
-        sort_by (str): The sorting criteria. Available options are "price_asc" and "price_desc".
-        query (Session): The database query.
+        request (Request): The incoming request.
+        search (str, optional): A search string to filter by product name or description.
+        search_mode (str, optional): "fulltext", "fuzzy" or "substring". Defaults to "substring".
+        min_price (float, optional): The minimum price to filter by.
+        max_price (float, optional): The maximum price to filter by.
+        sort_by (str, optional): The field to sort by. Defaults to None.
+        limit (int, optional): The number of products to return. Defaults to 10.
+        offset (int, optional): The number of products to skip. Defaults to 0.
+        cursor (str, optional): The X-Next-Cursor of the previous page. Defaults to None.
 
     Returns:
-        Session: The sorted database query.
+        List[ProductOut]: A list of products that match the given criteria.
     """
-    if sort_by == "price_asc":
-        query = query.order_by(asc(ProductModel.price))
-    if sort_by == "price_desc":
-        query = query.order_by(desc(ProductModel.price))
-    return query
+    headers = await cache_headers(db, CATALOG_SCOPES)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    return await list_products(
+        search,
+        min_price,
+        max_price,
+        sort_by,
+        limit,
+        offset,
+        db,
+        cursor,
+        search_mode,
+        headers,
+    )
 
 
-@router.get("/all", response_model=List[ProductOut])
-def get_all_product(
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+    request: Request,
+    response: Response,
     search: Optional[str] = None,
+    search_mode: str = Query("substring", regex="^(fulltext|fuzzy|substring)$"),
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
-    sort_by: Optional[str] = Query(None, regex="^(price_asc|price_desc)$"),
-    limit: int = Query(10, gt=0),
-    offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Retrieve a list of products that match the given criteria.
+    Summarize the products matching the /products/all filters for filter widgets.
+
+    Returns the number of matches, how many are in stock, their price range
+    and a histogram of their prices in 1-2-5 steps (0-1, 1-2, 2-5, 5-10, ...).
+    Responses carry the catalog ETag, like /products/all.
 
     Args:
+        request (Request): The incoming request.
+        response (Response): The response to set the validator headers on.
         search (str, optional): A search string to filter by product name or description.
+        search_mode (str, optional): "fulltext", "fuzzy" or "substring". Defaults to "substring".
         min_price (float, optional): The minimum price to filter by.
         max_price (float, optional): The maximum price to filter by.
-        sort_by (str, optional): The field to sort by. Defaults to None.
-        limit (int, optional): The number of products to return. Defaults to 10.
-        offset (int, optional): The number of products to skip. Defaults to 0.
 
     Returns:
-        List[ProductOut]: A list of products that match the given criteria.
+        ProductFacets: The match count, in-stock count, price range and histogram.
     """
-    query = db.query(ProductModel)
-    if search:
-        query = query.filter(
-            or_(
-                ProductModel.product_name.ilike(f"%{search}%"),
-                ProductModel.description.ilike(f"{search}"),
-            )
-        )
+    headers = await cache_headers(db, CATALOG_SCOPES)
+    cached = not_modified(request, headers)
+    if cached:
+        return cached
+    response.headers.update(headers)
+    return await product_facets(search, min_price, max_price, db, search_mode)
+
+
+@router.get("/suggest", response_model=List[ProductSuggestion])
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(5, gt=0, le=20),
+):
+    """
+    Suggest product names for a search box, as the user types.
 
-    query = price_filter(min_price=min_price, max_price=max_price, query=query)
-    query = sort_filter(sort_by=sort_by, query=query)
-    data = query.offset(offset).limit(limit).all()
-    return data
+    Served from this worker's in-memory prefix index, without a database
+    query. Any word of a name can match; names starting with `q` come first.
+
+    Args:
+        q (str): What the user typed so far.
+        limit (int, optional): The number of suggestions. Defaults to 5.
+
+    Returns:
+        List[ProductSuggestion]: Matching product ids and names.
+    """
+    return JSONResponse(content=suggest_index.suggest(q, limit))
 
 
 @router.post("/add")
-def add_products_info(
+async def add_products_info(
     product_name: str = Form(...),
     price: float = Form(...),
     stock: int = Form(...),
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Adds a new product to the database.
@@ -169,7 +213,7 @@ def add_products_info(
         stock (int): The stock quantity of the product.
         image (Optional[UploadFile]): An optional image file for the product.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary containing a success message and the product details.
@@ -193,19 +237,47 @@ def add_products_info(
         product_details.product_name, product_details.price, product_details.stock
     )
 
-    return add_products(product_details, image, user.id, db)
+    return await add_products(product_details, image, user.id, db)
+
+
+@router.post("/import")
+async def import_products_file(
+    file: UploadFile = File(...),
+    user: UserModel = Depends(get_async_current_user),
+):
+    """
+    Adds many products at once from a CSV or NDJSON file.
+
+    CSV files need a header with product_name, price, stock and optionally
+    description; NDJSON files hold one object with those keys per line.
+    Rows are validated like POST /products/add. Rows that are invalid, or
+    whose name repeats an earlier row or an existing product, are skipped
+    and listed in the report with their line number.
+
+    Args:
+        file (UploadFile): The CSV (.csv) or NDJSON (.ndjson, .jsonl) file.
+        user (UserModel): The current user retrieved from the access token.
+
+    Returns:
+        dict: The rows read, inserted and rejected, and the rejected rows with the reason.
+
+    Raises:
+        HTTPException: If the user is not an admin or the file is not a supported type.
+    """
+    check_admin(user.role)
+    return await bulk_import_products(file, user.id)
 
 
 @router.put("/update/{product_id}")
-def update_product_info(
+async def update_product_info(
     product_id: int,
     product_name: Optional[str] = Form(None),
     price: Optional[int] = Form(None),
     stock: Optional[int] = Form(None),
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Updates the details of an existing product in the database.
@@ -221,7 +293,7 @@ def update_product_info(
         stock (Optional[int]): The new stock quantity of the product.
         image (Optional[UploadFile]): An optional new image file for the product.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session to use for the operation.
+        db (AsyncSession): The database session to use for the operation.
 
     Returns:
         dict: A dictionary containing a success message and the updated product details.
@@ -240,14 +312,14 @@ def update_product_info(
             detail="Unprocessable Entity.Aryan",
         )
     check_admin(user.role)
-    return update_product(product_details, image, product_id, db)
+    return await update_product(product_details, image, product_id, db)
 
 
 @router.delete("/delete/{product_id}")
-def delete_product_info(
+async def delete_product_info(
     product_id: int,
-    user: UserModel = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    user: UserModel = Depends(get_async_current_user),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Deletes a product from the database.
@@ -257,7 +329,7 @@ def delete_product_info(
     Args:
         product_id (int): The id of the product to be deleted.
         user (UserModel): The current user retrieved from the access token.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary containing a success message.
@@ -266,4 +338,4 @@ def delete_product_info(
         HTTPException: If the user is not an admin.
     """
     check_admin(user.role)
-    return delete_product(product_id, user, db)
+    return await delete_product(product_id, user, db)
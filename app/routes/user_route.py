@@ -1,15 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    status,
+    Response,
+    Request,
+)
 from sqlalchemy.orm import Session
 from app.schemas.user_schema import UserRegister, UserLogin, UserResponse
 from app.services.user_services import (
     register_user,
     login_user,
     refresh_access_token,
+    revoke_refresh_token,
     delete_user_account,
 )
 from app.crud.users import update_users
 from app.core.database import get_db
-from app.core.security import is_logged_in, get_current_user
+from app.core.rate_limit import throttle_login
+from app.core.security import is_logged_in, get_current_user, evict_token
 from app.models.users import UserModel
 
 router = APIRouter()
@@ -109,6 +119,7 @@ def register(
 @router.post("/login", summary="Login user")
 def login(
     user: UserLogin,
+    request: Request,
     response: Response,
     _: None = Depends(is_logged_in),
     db: Session = Depends(get_db),
@@ -118,6 +129,7 @@ def login(
 
     Args:
         user (UserLogin): The user's login credentials containing email and password.
+        request (Request): The HTTP request, for the client address.
         response (Response): The response object to set the access token.
         _ (None): A dependency check to ensure the user is not logged in.
         db (Session): The database session to use for the operation.
@@ -128,10 +140,12 @@ def login(
     Raises:
         HTTPException: If the user doesn't exist, a 404 status code is raised with a detail message.
                        If the password is incorrect, a 400 status code is raised with a detail message.
+                       If the account or the client made too many attempts, a 429 status code is raised.
                        If there is an operational error during the database transaction,
                        a 500 Internal Server Error is raised indicating a database connection issue.
     """
     validate_fields(user.email, user.password)
+    throttle_login(request, user.email)
     return login_user(user, response, db)
 
 
@@ -176,6 +190,7 @@ def delete_user(
     user_id: int,
     user: UserLogin,
     response: Response,
+    background_tasks: BackgroundTasks,
     data: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -191,6 +206,7 @@ def delete_user(
         user_id (int): The ID of the user to be deleted.
         user (UserLogin): The login credentials for the user.
         response (Response): The response object to delete the access token cookie.
+        background_tasks (BackgroundTasks): Runs the image cleanup after the response.
         data (UserModel): The current user retrieved from the access token.
         db (Session): The database session to use for the operation.
 
@@ -206,11 +222,13 @@ def delete_user(
     check_user(data.role)
     validate_fields(user.email, user.password)
     authorize_user(data.id, user_id)
-    return delete_user_account(user, response, db)
+    return delete_user_account(user, response, background_tasks, db)
 
 
 @router.post("/refresh-token")
-def refresh_token(request: Request, response: Response) -> dict[str, str]:
+def refresh_token(
+    request: Request, response: Response, db: Session = Depends(get_db)
+) -> dict[str, str]:
     """
     Refreshes the access token with a new one by providing a valid refresh token.
 
@@ -220,34 +238,44 @@ def refresh_token(request: Request, response: Response) -> dict[str, str]:
 
     Args:
         request (Request): The HTTP request containing the cookies.
-        response (Response): The response object to set the new access token cookie.
+        response (Response): The response object to set the new token cookies.
+        db (Session): The database session holding the revoked tokens.
 
     Returns:
         dict: A dictionary containing a success message.
 
     Raises:
-        HTTPException: If the refresh token is not provided.
+        HTTPException: If the refresh token is not provided, invalid, revoked or reused.
     """
     token = request.cookies.get("refresh_token")
     if not token:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN, detail="Missing refresh token."
         )
-    return refresh_access_token(token, response)
+    return refresh_access_token(token, response, db)
 
 
 @router.post("/logout")
-def logout_user(response: Response, data: UserModel = Depends(get_current_user)):
+def logout_user(
+    request: Request,
+    response: Response,
+    data: UserModel = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
     """
     Logs out the current user by deleting the access token cookie.
 
     This endpoint logs out the current user by deleting the access token cookie set
     in the user's browser. It retrieves the current user from the access token and
-    checks that the user has the appropriate "user" role.
+    checks that the user has the appropriate "user" role. The token is also
+    evicted from the verified-token cache, and the refresh token's family is
+    revoked so neither it nor a copy of it can be refreshed again.
 
     Args:
+        request (Request): The HTTP request containing the cookies.
         response (Response): The response object to delete the access token cookie.
         data (UserModel): The current user retrieved from the access token.
+        db (Session): The database session holding the revoked tokens.
 
     Returns:
         dict: A dictionary containing a success message.
@@ -255,6 +283,8 @@ def logout_user(response: Response, data: UserModel = Depends(get_current_user))
     Raises:
         HTTPException: If the user role is not "user".
     """
+    revoke_refresh_token(request.cookies.get("refresh_token"), db)
+    evict_token(request.cookies.get("access_token"))
     response.delete_cookie("access_token")
     response.delete_cookie("refresh_token")
     return {"message": "Logout Successfully."}
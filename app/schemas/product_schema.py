@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from app.models.products import ProductModel
 import os
 
@@ -28,3 +28,22 @@ class ProductOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProductSuggestion(BaseModel):
+    product_id: int
+    product_name: str
+
+
+class PriceBucket(BaseModel):
+    min_price: float
+    max_price: Optional[float]
+    count: int
+
+
+class ProductFacets(BaseModel):
+    total: int
+    in_stock: int
+    min_price: Optional[float]
+    max_price: Optional[float]
+    price_histogram: List[PriceBucket]
@@ -1,12 +1,13 @@
 from fastapi import status, HTTPException, Response
 from app.models.users import UserModel
-from app.crud.users import add_user
+from app.crud.users import add_user, update_password_hash
 from app.core.security import (
     create_access_token,
     set_access_token,
     create_refresh_token,
     set_refresh_token,
-    verify_pwd,
+    verify_and_update_pwd,
+    token_claims,
 )
 from app.schemas.user_schema import AdminSchema, UserLogin, UserResponse
 from sqlalchemy.orm import Session
@@ -65,13 +66,15 @@ def login_admin(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Admin doesn't Exists."
         )
-    check_pwd = verify_pwd(admin_data.password, data.password)
+    check_pwd, new_hash = verify_and_update_pwd(admin_data.password, data.password)
     if not check_pwd:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect Password."
         )
-    token = create_access_token(dict({"sub": str(data.id)}))
-    refresh_token = create_refresh_token(dict({"sub": str(data.id)}))
+    if new_hash:
+        update_password_hash(data, new_hash, db)
+    token = create_access_token(token_claims(data))
+    refresh_token = create_refresh_token(token_claims(data))
     set_access_token(response, token)
     set_refresh_token(response, refresh_token)
     return {"message": "Admin Logged in Successfully."}
@@ -4,29 +4,34 @@ from app.models.users import UserModel
 from fastapi import HTTPException, status
 from app.crud.cart import add_product, delete_cart_product, update_cart_details
 from app.crud.order import add_ordered_cart_items
+from app.crud.products import get_product
+from app.core.transaction import run_in_transaction
 from app.schemas.cart_schema import CartOut
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-def check_cart(user_id, product_id, db):
+async def check_cart(user_id, product_id, db):
     """
     Checks if a product is already in the user's cart.
 
     Args:
         user_id (int): The ID of the user.
         product_id (int): The ID of the product.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Raises:
         HTTPException: If the product already exists in the cart, raises a 409 Conflict.
     """
 
-    data = (
-        db.query(CartModel)
-        .filter(CartModel.owner_id == user_id, CartModel.product_id == product_id)
-        .first()
+    result = await db.execute(
+        select(CartModel).filter(
+            CartModel.owner_id == user_id, CartModel.product_id == product_id
+        )
     )
+    data = result.scalars().first()
 
     if data:
         raise HTTPException(
@@ -78,8 +83,8 @@ def check_stock_availablity(stock: int, quantity: int):
     return
 
 
-def validate_and_add_to_cart(
-    user: UserModel, quantity: int, product_id: int, db: Session
+async def validate_and_add_to_cart(
+    user: UserModel, quantity: int, product_id: int, db: AsyncSession
 ) -> CartModel:
     """
     Validates the product and adds it to the user's cart.
@@ -93,7 +98,7 @@ def validate_and_add_to_cart(
         user (UserModel): The user model object.
         quantity (int): The quantity of the product to be added.
         product_id (int): The id of the product to be added.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         CartModel: The added product's row in the cart table.
@@ -104,21 +109,26 @@ def validate_and_add_to_cart(
             the available stock.
     """
 
-    data = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-    check_cart(user.id, product_id, db)
+    data = await get_product(product_id, db, exact=True)
+    await check_cart(user.id, product_id, db)
     get_product_or_404(data)
     check_stock_availablity(data.stock, quantity)
 
-    return add_product(user.id, quantity, product_id, db)
+    return await add_product(user.id, quantity, product_id, db)
 
 
-def cart_details(user: UserModel, db: Session) -> List[CartModel]:
+async def cart_details(user: UserModel, db: AsyncSession) -> List[CartModel]:
     """
     Returns the user's cart items.
 
+    The owner, product and product seller are loaded up front, since the
+    cart response reads them for every row. Rows whose product was deleted
+    are left out: deleted products are not loaded, and carts and products
+    may live on different shards, so they cannot be joined in SQL.
+
     Args:
         user (UserModel): The user model object.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         List[CartModel]: The cart items.
@@ -126,14 +136,24 @@ def cart_details(user: UserModel, db: Session) -> List[CartModel]:
     Raises:
         HTTPException: If the cart is empty, raises a 404 Not Found.
     """
-    data = db.query(CartModel).filter(CartModel.owner_id == user.id).all()
+    result = await db.execute(
+        select(CartModel)
+        .filter(CartModel.owner_id == user.id)
+        .options(
+            selectinload(CartModel.owner),
+            selectinload(CartModel.product).selectinload(ProductModel.admin),
+        )
+    )
+    data = [item for item in result.scalars().all() if item.product is not None]
 
     if not data:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Cart Empty.")
     return data
 
 
-def update_cart(user: UserModel, product_id: int, new_quantity: int, db: Session):
+async def update_cart(
+    user: UserModel, product_id: int, new_quantity: int, db: AsyncSession
+):
     """
     Updates the quantity of a product in the user's cart.
 
@@ -145,7 +165,7 @@ def update_cart(user: UserModel, product_id: int, new_quantity: int, db: Session
         user (UserModel): The user model object.
         product_id (int): The ID of the product to update.
         new_quantity (int): The new desired quantity of the product.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing a success message and the updated cart item details.
@@ -155,23 +175,24 @@ def update_cart(user: UserModel, product_id: int, new_quantity: int, db: Session
                        unavailable for the requested quantity.
     """
 
-    data = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+    data = await get_product(product_id, db)
     get_product_or_404(data)
-    cart_data = (
-        db.query(CartModel)
-        .filter(CartModel.product_id == product_id, CartModel.owner_id == user.id)
-        .first()
+    result = await db.execute(
+        select(CartModel).filter(
+            CartModel.product_id == product_id, CartModel.owner_id == user.id
+        )
     )
+    cart_data = result.scalars().first()
     if not cart_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product is not in the cart."
         )
     check_stock_availablity(data.stock, new_quantity)
-    return update_cart_details(cart_data, new_quantity, db)
+    return await update_cart_details(cart_data, new_quantity, db)
 
 
-def delete_cart_item_details(
-    user: UserModel, product_id: int, db: Session
+async def delete_cart_item_details(
+    user: UserModel, product_id: int, db: AsyncSession
 ) -> dict[str, str]:
     """
     Deletes a product from the user's cart.
@@ -179,7 +200,7 @@ def delete_cart_item_details(
     Args:
         user (UserModel): The user model object.
         product_id (int): The id of the product to be deleted.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict[str, str]: A dictionary containing a success message.
@@ -188,42 +209,55 @@ def delete_cart_item_details(
         HTTPException: If the cart item does not exist, raises a 404 Not Found.
     """
 
-    data = (
-        db.query(CartModel)
-        .filter(CartModel.product_id == product_id, CartModel.owner_id == user.id)
-        .first()
+    result = await db.execute(
+        select(CartModel).filter(
+            CartModel.product_id == product_id, CartModel.owner_id == user.id
+        )
     )
+    data = result.scalars().first()
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Cart item doesn't exists."
         )
 
-    return delete_cart_product(data, db)
+    return await delete_cart_product(data, db)
 
 
-def cart_order_items(product_ids: List, user: UserModel, db: Session):
+async def cart_order_items(product_ids: List, user: UserModel, db: AsyncSession):
     """
     Places an order for all products in the given list of product IDs currently in the user's cart.
 
+    Checkout runs at the checkout isolation level and is retried when it
+    collides with concurrent orders on the same products.
+
     Args:
         product_ids (List): A list of product IDs to place an order for.
         user (UserModel): The user model object.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary with order details and a list of unavailable products.
     """
-    fetched_products = (
-        db.query(ProductModel).filter(ProductModel.id.in_(product_ids)).all()
-    )
-    stock_available = [p for p in fetched_products if p.stock > 0]
-    stock_unavailable = [p for p in fetched_products if p.stock <= 0]
-
-    existing_ids = {p.id for p in fetched_products}
-    missing_products = set(product_ids) - existing_ids
-    return add_ordered_cart_items(
-        stock_available=stock_available,
-        stock_unavailable=stock_unavailable,
-        user=user,
-        db=db,
-    )
+    user_id = user.id
+
+    async def checkout():
+        buyer = await db.get(UserModel, user_id)
+        result = await db.execute(
+            select(ProductModel)
+            .filter(ProductModel.id.in_(product_ids))
+            .options(selectinload(ProductModel.admin))
+        )
+        fetched_products = result.scalars().all()
+        stock_available = [p for p in fetched_products if p.stock > 0]
+        stock_unavailable = [p for p in fetched_products if p.stock <= 0]
+
+        existing_ids = {p.id for p in fetched_products}
+        missing_products = set(product_ids) - existing_ids
+        return await add_ordered_cart_items(
+            stock_available=stock_available,
+            stock_unavailable=stock_unavailable,
+            user=buyer,
+            db=db,
+        )
+
+    return await run_in_transaction(db, checkout)
@@ -0,0 +1,603 @@
+from app.models.products import ProductModel
+from app.schemas.product_schema import ProductOut
+from app.core.cache import ListingPage, listing_cache
+from app.core.sharding import SHARDING_ENABLED, fan_out
+from app.core.trigram import FUZZY_THRESHOLD
+from fastapi import HTTPException, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import Select, select, or_, and_, asc, desc, tuple_, false, func
+from sqlalchemy import case, literal, literal_column
+from sqlalchemy import Boolean, Float
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+import base64
+import binascii
+import json
+import re
+
+# The listing selects exactly the ProductOut fields, in the same order, so
+# the rows serialize to the same JSON the response model would produce.
+LISTING_FIELDS = tuple(ProductOut.model_fields)
+LISTING_COLUMNS = tuple(getattr(ProductModel, field) for field in LISTING_FIELDS)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Upper bounds of the facet price buckets, 1-2-5 steps from 1 to 1,000,000;
+# a last, open bucket holds the higher prices.
+PRICE_EDGES = tuple(m * 10**e for e in range(6) for m in (1, 2, 5)) + (10**6,)
+
+
+class search_match(FunctionElement):
+    """Whether a product's name or description contains all the search terms."""
+
+    type = Boolean()
+    inherit_cache = True
+    # A condition as it stands: on SQLite a Boolean would be compared with
+    # "= 1", which hides the products_fts rowid lookup from the planner.
+    _is_implicitly_boolean = True
+
+
+class search_rank(FunctionElement):
+    """How well a product matches the search terms; higher is better."""
+
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(search_match, "postgresql")
+def pg_search_match(element, compiler, **kw):
+    terms = compiler.process(element.clauses, **kw)
+    return f"products.search_vector @@ plainto_tsquery('english', {terms})"
+
+
+@compiles(search_rank, "postgresql")
+def pg_search_rank(element, compiler, **kw):
+    terms = compiler.process(element.clauses, **kw)
+    return f"ts_rank(products.search_vector, plainto_tsquery('english', {terms}))"
+
+
+def fts5_query(terms: str) -> str:
+    # Every term quoted, so FTS5 reads none of them as query syntax.
+    return f"'\"' || replace({terms}, ' ', '\" \"') || '\"'"
+
+
+@compiles(search_match, "sqlite")
+def sqlite_search_match(element, compiler, **kw):
+    query = fts5_query(compiler.process(element.clauses, **kw))
+    return (
+        "products.id IN (SELECT rowid FROM products_fts "
+        f"WHERE products_fts MATCH {query})"
+    )
+
+
+@compiles(search_rank, "sqlite")
+def sqlite_search_rank(element, compiler, **kw):
+    query = fts5_query(compiler.process(element.clauses, **kw))
+    return (
+        "(SELECT -bm25(products_fts, 2.0, 1.0) FROM products_fts "
+        f"WHERE products_fts MATCH {query} AND products_fts.rowid = products.id)"
+    )
+
+
+class fuzzy_match(FunctionElement):
+    """Whether a product name contains words similar to the search string."""
+
+    type = Boolean()
+    inherit_cache = True
+    _is_implicitly_boolean = True
+
+
+@compiles(fuzzy_match, "postgresql")
+def pg_fuzzy_match(element, compiler, **kw):
+    # Uses the trigram index, with pg_trgm.word_similarity_threshold. Built
+    # with op() so the % is escaped for the driver's paramstyle.
+    (search,) = element.clauses
+    return compiler.process(search.op("<%")(ProductModel.product_name), **kw)
+
+
+@compiles(fuzzy_match, "sqlite")
+def sqlite_fuzzy_match(element, compiler, **kw):
+    search = compiler.process(element.clauses, **kw)
+    return f"word_similarity({search}, products.product_name) >= {FUZZY_THRESHOLD:f}"
+
+
+def search_terms(search: str | None) -> str | None:
+    """Return the words of a search string, space separated, or None."""
+    return " ".join(re.findall(r"\w+", search or "")) or None
+
+
+def price_filter(min_price: float | None, max_price: float | None, query: Select):
+    """
+    Filters the products based on their price.
+
+    Args:
+        min_price (float|None): The minimum price.
+        max_price (float|None): The maximum price.
+        query (Select): The database query.
+
+    Returns:
+        Select: The filtered database query.
+
+    Raises:
+        HTTPException: If the minimum price is greater than the maximum price.
+    """
+    if min_price is not None:
+        query = query.filter(ProductModel.price >= min_price)
+    if max_price is not None:
+        query = query.filter(ProductModel.price <= max_price)
+    if min_price is not None and max_price is not None and min_price == max_price:
+        query = query.filter(ProductModel.price == min_price)
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Minimum price cannot be greater than maximum price.",
+        )
+    return query
+
+
+def sort_filter(sort_by: str, query):
+    """
+    Sorts the products based on the given criteria.
+
+    The product id breaks ties, and is the order when no criteria is given,
+    so every page has a stable position to continue from.
+
+    Args:
+        sort_by (str): The sorting criteria. Available options are "price_asc" and "price_desc".
+        query (Select): The database query.
+
+    Returns:
+        Select: The sorted database query.
+    """
+    if sort_by == "price_asc":
+        query = query.order_by(asc(ProductModel.price), asc(ProductModel.id))
+    elif sort_by == "price_desc":
+        query = query.order_by(desc(ProductModel.price), desc(ProductModel.id))
+    else:
+        query = query.order_by(asc(ProductModel.id))
+    return query
+
+
+def relevance(search: str | None, search_mode: str):
+    """Return the rank expression of a full-text or fuzzy search, or None."""
+    if search_mode == "fulltext" and search_terms(search):
+        return search_rank(search_terms(search))
+    if search_mode == "fuzzy" and search and search.strip():
+        return func.word_similarity(search.strip(), ProductModel.product_name)
+    return None
+
+
+def listing_order(
+    search: str | None, sort_by: str | None, search_mode: str
+) -> str | None:
+    """
+    Returns the order of a listing: the requested sort, else "relevance"
+    for a ranked search, else None for the product id.
+    """
+    if sort_by is None and relevance(search, search_mode) is not None:
+        return "relevance"
+    return sort_by
+
+
+def sort_key(sort_by: str | None, row) -> list:
+    """Return the values a listing row is sorted by, in ORDER BY order."""
+    if sort_by == "relevance":
+        return [row.rank, row.id]
+    if sort_by:
+        return [row.price, row.id]
+    return [row.id]
+
+
+def merge_key(sort_by: str | None):
+    """Return the key merging shard results in the order of the listing."""
+    if sort_by == "relevance":
+        return lambda row: (-row.rank, row.id)
+    return lambda row: sort_key(sort_by, row)
+
+
+def encode_cursor(sort_by: str | None, row) -> str:
+    """
+    Builds the opaque cursor pointing after the given listing row.
+
+    Args:
+        sort_by (str|None): The sorting criteria of the listing.
+        row (Row): The last row of the page.
+
+    Returns:
+        str: URL-safe cursor for the next page.
+    """
+    data = json.dumps({"s": sort_by, "k": sort_key(sort_by, row)})
+    return base64.urlsafe_b64encode(data.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, sort_by: str | None) -> list:
+    """
+    Reads the sort values back from a cursor.
+
+    Args:
+        cursor (str): The cursor returned with the previous page.
+        sort_by (str|None): The sorting criteria of this request.
+
+    Returns:
+        list: The sort values of the last row of the previous page.
+
+    Raises:
+        HTTPException: If the cursor is malformed or was issued for another sort.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        values = data["k"]
+        valid = data["s"] == sort_by and len(values) == (2 if sort_by else 1)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+    return values
+
+
+def keyset_filter(
+    sort_by: str | None, values: list, query: Select, rank=None
+) -> Select:
+    """
+    Keeps the rows after the given sort values, in the listing's order.
+
+    A row-value comparison on the ORDER BY columns lets the database seek
+    straight into the index instead of skipping the earlier rows.
+
+    Args:
+        sort_by (str|None): The sorting criteria.
+        values (list): The sort values of the last row already served.
+        query (Select): The database query.
+        rank (ColumnElement|None): The rank expression, for the relevance order.
+
+    Returns:
+        Select: The filtered database query.
+    """
+    if sort_by == "relevance":
+        # Descending rank, ascending id: no single row-value comparison.
+        return query.filter(
+            or_(rank < values[0], and_(rank == values[0], ProductModel.id > values[1]))
+        )
+    if sort_by:
+        key = tuple_(ProductModel.price, ProductModel.id)
+        position = tuple_(*values)
+    else:
+        key, position = ProductModel.id, values[0]
+    if sort_by == "price_desc":
+        return query.filter(key < position)
+    return query.filter(key > position)
+
+
+def catalog_filter(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    search_mode: str,
+    query: Select,
+) -> Select:
+    """
+    Filters the products by the search and price criteria of a listing.
+
+    Args:
+        search (str|None): A search string to filter by product name or description.
+        min_price (float|None): The minimum price.
+        max_price (float|None): The maximum price.
+        search_mode (str): "fulltext", "fuzzy" or "substring", see listing_query.
+        query (Select): The database query.
+
+    Returns:
+        Select: The filtered database query.
+    """
+    if search and search_mode == "substring":
+        query = query.filter(
+            or_(
+                ProductModel.product_name.ilike(f"%{search}%"),
+                ProductModel.description.ilike(f"%{search}%"),
+            )
+        )
+    elif search:
+        if relevance(search, search_mode) is None:
+            return query.filter(false())
+        if search_mode == "fuzzy":
+            query = query.filter(fuzzy_match(search.strip())).execution_options(
+                fuzzy_search=True
+            )
+        else:
+            query = query.filter(search_match(search_terms(search)))
+    return price_filter(min_price=min_price, max_price=max_price, query=query)
+
+
+def listing_query(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    sort_by: str | None,
+    search_mode: str = "substring",
+) -> Select:
+    """
+    Builds the Core select of the catalog listing columns.
+
+    The product id is selected first, for the shard merge; it is not part
+    of the response. A full-text or fuzzy search also selects the rank,
+    last, and orders by it unless another sort is requested.
+
+    Args:
+        search (str|None): A search string to filter by product name or description.
+        min_price (float|None): The minimum price.
+        max_price (float|None): The maximum price.
+        sort_by (str|None): The sorting criteria.
+        search_mode (str): "fulltext" to match whole words, ranked,
+                           "fuzzy" to match misspelled names, ranked by
+                           similarity, or "substring" (the default) to
+                           match any part of the text.
+
+    Returns:
+        Select: The filtered and sorted query, without limit and offset.
+    """
+    query = select(ProductModel.id, *LISTING_COLUMNS)
+    rank = relevance(search, search_mode)
+    if rank is not None:
+        query = query.add_columns(rank.label("rank"))
+    query = catalog_filter(search, min_price, max_price, search_mode, query)
+    if listing_order(search, sort_by, search_mode) == "relevance":
+        return query.order_by(desc("rank"), asc(ProductModel.id))
+    return sort_filter(sort_by=sort_by, query=query)
+
+
+def listing_key(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    sort_by: str | None,
+    limit: int,
+    offset: int,
+    cursor: str | None,
+    search_mode: str,
+) -> tuple:
+    """
+    Returns the listing cache key: the parameters that select the page,
+    normalized so that equivalent requests share an entry.
+    """
+    search = (search or "").strip() or None
+    return (
+        search,
+        search_mode if search else None,
+        min_price,
+        max_price,
+        sort_by,
+        limit,
+        offset,
+        cursor or None,
+    )
+
+
+def page_response(page: ListingPage) -> Response:
+    headers = dict(page.headers or {})
+    if page.next_cursor:
+        headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return Response(page.body, media_type="application/json", headers=headers)
+
+
+def serialize_rows(rows) -> list[dict]:
+    """
+    Turns listing rows into ProductOut-shaped dictionaries, dropping the id.
+
+    Args:
+        rows (Sequence[Row]): Rows of the listing query.
+
+    Returns:
+        list[dict]: One dictionary per product.
+    """
+    return [dict(zip(LISTING_FIELDS, row[1:])) for row in rows]
+
+
+async def list_products(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    sort_by: str | None,
+    limit: int,
+    offset: int,
+    db: AsyncSession,
+    cursor: str | None = None,
+    search_mode: str = "substring",
+    headers: dict | None = None,
+) -> Response:
+    """
+    Returns a page of the catalog without building ORM objects.
+
+    Pages are addressed either by `offset` or by the `cursor` sent in the
+    X-Next-Cursor header of the previous page. A cursor costs the same at
+    any depth; an offset makes the database read and discard every earlier
+    row. The header is only set when there is a next page. Full-text and
+    fuzzy results come best match first unless `sort_by` is given.
+
+    Serialized pages are kept in `listing_cache` for LISTING_CACHE_TTL
+    seconds; product and order changes drop the pages they affect. A cached
+    page is sent with the headers it was built with: another worker's
+    change reaches this cache only with the TTL, so the page must not carry
+    the newer ETag.
+
+    Args:
+        search (str|None): A search string to filter by product name or description.
+        min_price (float|None): The minimum price.
+        max_price (float|None): The maximum price.
+        sort_by (str|None): The sorting criteria.
+        limit (int): The number of products to return.
+        offset (int): The number of products to skip.
+        db (AsyncSession): The database session.
+        cursor (str|None): The cursor of the page to return.
+        search_mode (str): "fulltext", "fuzzy" or "substring", see listing_query.
+        headers (dict|None): Validator headers from `cache_headers` to send with the page.
+
+    Returns:
+        Response: The page, serialized like List[ProductOut].
+
+    Raises:
+        HTTPException: If both a cursor and an offset are given, or the cursor is invalid.
+    """
+    if cursor and offset:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either a cursor or an offset.",
+        )
+    key = listing_key(
+        search,
+        min_price,
+        max_price,
+        sort_by,
+        limit,
+        offset,
+        cursor,
+        search_mode,
+    )
+    page = listing_cache.get(key)
+    if page is not None:
+        return page_response(page)
+    query = listing_query(search, min_price, max_price, sort_by, search_mode)
+    order = listing_order(search, sort_by, search_mode)
+    if cursor:
+        values = decode_cursor(cursor, order)
+        query = keyset_filter(order, values, query, relevance(search, search_mode))
+    # One extra row tells whether there is a next page.
+    if SHARDING_ENABLED:
+        rows = await fan_out(
+            db,
+            query,
+            limit + 1,
+            offset,
+            key=merge_key(order),
+            reverse=order == "price_desc",
+            scalars=False,
+        )
+    else:
+        result = await db.execute(query.offset(offset).limit(limit + 1))
+        rows = result.all()
+    product_ids = frozenset(row[0] for row in rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(order, rows[-1])
+    body = JSONResponse(content=serialize_rows(rows)).body
+    page = ListingPage(body, next_cursor, product_ids, min_price, max_price, headers)
+    listing_cache.set(key, page, size=len(body))
+    return page_response(page)
+
+
+def price_bucket(low: int, high: int):
+    """
+    Returns the index of a product's price bucket, between `low` and `high`,
+    as CASEs nested by halves: a few comparisons per row instead of one per
+    bucket.
+    """
+    if low == high:
+        return literal(low)
+    middle = (low + high) // 2
+    return case(
+        (ProductModel.price < PRICE_EDGES[middle], price_bucket(low, middle)),
+        else_=price_bucket(middle + 1, high),
+    )
+
+
+def facets_query(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    search_mode: str = "substring",
+) -> Select:
+    """
+    Builds the aggregate of the catalog facets: the products matching the
+    listing filters, counted per price bucket in one pass over them.
+
+    Each row holds a bucket index into PRICE_EDGES, its product count,
+    its lowest and highest price and its in-stock count.
+    """
+    bucket = price_bucket(0, len(PRICE_EDGES)).label("bucket")
+    query = select(
+        bucket,
+        func.count().label("count"),
+        func.min(ProductModel.price).label("min_price"),
+        func.max(ProductModel.price).label("max_price"),
+        func.sum(case((ProductModel.stock > 0, 1), else_=0)).label("in_stock"),
+    )
+    query = catalog_filter(search, min_price, max_price, search_mode, query)
+    # By name: a repeated CASE would get its own bind parameters, which
+    # PostgreSQL does not accept as the same expression.
+    return query.group_by(literal_column("bucket"))
+
+
+def merge_facets(rows) -> dict:
+    """
+    Turns the per-bucket rows of `facets_query` into the facets response.
+
+    Rows of the same bucket, as returned by several shards, are added up.
+    The histogram runs from the lowest to the highest non-empty bucket.
+
+    Args:
+        rows (Sequence[Row]): Rows of the facets query.
+
+    Returns:
+        dict: The facets, shaped like ProductFacets.
+    """
+    buckets = {}
+    for row in rows:
+        count, low, high, in_stock = buckets.get(row.bucket, (0, None, None, 0))
+        buckets[row.bucket] = (
+            count + row.count,
+            row.min_price if low is None else min(low, row.min_price),
+            row.max_price if high is None else max(high, row.max_price),
+            in_stock + (row.in_stock or 0),
+        )
+    if not buckets:
+        return {
+            "total": 0,
+            "in_stock": 0,
+            "min_price": None,
+            "max_price": None,
+            "price_histogram": [],
+        }
+    edges = (0, *PRICE_EDGES, None)
+    return {
+        "total": sum(b[0] for b in buckets.values()),
+        "in_stock": sum(b[3] for b in buckets.values()),
+        "min_price": min(b[1] for b in buckets.values()),
+        "max_price": max(b[2] for b in buckets.values()),
+        "price_histogram": [
+            {
+                "min_price": edges[i],
+                "max_price": edges[i + 1],
+                "count": buckets.get(i, (0,))[0],
+            }
+            for i in range(min(buckets), max(buckets) + 1)
+        ],
+    }
+
+
+async def product_facets(
+    search: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    db: AsyncSession,
+    search_mode: str = "substring",
+) -> dict:
+    """
+    Returns the filter facets of the catalog: the match count, the price
+    range, a price histogram and the in-stock count, from one aggregate
+    query. On a sharded catalog the query runs on every shard and the
+    buckets are added up.
+
+    Args:
+        search (str|None): A search string to filter by product name or description.
+        min_price (float|None): The minimum price.
+        max_price (float|None): The maximum price.
+        db (AsyncSession): The database session.
+        search_mode (str): "fulltext", "fuzzy" or "substring", see listing_query.
+
+    Returns:
+        dict: The facets, shaped like ProductFacets.
+    """
+    result = await db.execute(facets_query(search, min_price, max_price, search_mode))
+    return merge_facets(result.all())
@@ -2,8 +2,11 @@ from app.models.orders import OrderModel
 from app.models.products import ProductModel
 from fastapi import HTTPException, status
 from app.crud.order import add_order, delete_order
+from app.core.transaction import run_in_transaction
 from app.models.users import UserModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 def check_if_product_available(data, quantity) -> None:
@@ -47,8 +50,8 @@ def validate_order_exists(data: OrderModel) -> None:
     return
 
 
-def check_order_details(
-    product_id: int, quantity: int, user: UserModel, db: Session
+async def check_order_details(
+    product_id: int, quantity: int, user: UserModel, db: AsyncSession
 ) -> dict[str, str]:
     """
     Places an order for a product.
@@ -57,35 +60,48 @@ def check_order_details(
         product_id (int): The id of the product to be ordered.
         quantity (int): The quantity of the product being ordered.
         user (UserModel): The user model object.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary with the order details, including the order ID, product name, price, quantity, seller name, status, and total price.
     """
+    user_id = user.id
+
+    async def place_order():
+        buyer = await db.get(UserModel, user_id)
+        result = await db.execute(
+            select(ProductModel)
+            .filter(ProductModel.id == product_id)
+            .options(selectinload(ProductModel.admin))
+        )
+        product_data = result.scalars().first()
+        check_if_product_available(product_data, quantity)
+        return await add_order(
+            product_data=product_data, user_data=buyer, quantity=quantity, db=db
+        )
 
-    product_data = db.query(ProductModel).filter(ProductModel.id == product_id).first()
-    check_if_product_available(product_data, quantity)
-    return add_order(
-        product_data=product_data, user_data=user, quantity=quantity, db=db
-    )
+    return await run_in_transaction(db, place_order)
 
 
-def delete_order_details(order_id: int, user: UserModel, db: Session) -> dict[str, str]:
+async def delete_order_details(
+    order_id: int, user: UserModel, db: AsyncSession
+) -> dict[str, str]:
     """
     Cancels an order based on the order ID.
 
     Args:
         order_id (int): The id of the order to be cancelled.
         user (UserModel): The user model object.
-        db (Session): The database session dependency.
+        db (AsyncSession): The database session dependency.
 
     Returns:
         dict: A dictionary with a success message.
     """
-    data = (
-        db.query(OrderModel)
-        .filter(OrderModel.id == order_id, OrderModel.owner_id == user.id)
-        .first()
+    result = await db.execute(
+        select(OrderModel).filter(
+            OrderModel.id == order_id, OrderModel.owner_id == user.id
+        )
     )
+    data = result.scalars().first()
     validate_order_exists(data)
-    return delete_order(data, db)
+    return await delete_order(data, db)
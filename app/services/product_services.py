@@ -1,14 +1,23 @@
 from app.models.products import ProductModel
 from app.models.users import UserModel
 from fastapi import HTTPException, status, UploadFile, File
-from app.crud.products import add_product, update_product_info, delete_product_info
-from sqlalchemy.orm import Session
+from app.crud.products import (
+    add_product,
+    get_product,
+    update_product_info,
+    delete_product_info,
+)
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.schemas.product_schema import ProductDetails, UpdateProductDetails
+from app.core.bulk_import import import_format, import_products
+from app.core.cache import listing_cache
+import io
 import os, uuid
 
 
-def add_products(
-    product_detail: ProductModel, image: UploadFile | None, id: int, db: Session
+async def add_products(
+    product_detail: ProductModel, image: UploadFile | None, id: int, db: AsyncSession
 ):
     """
     Adds a new product to the database.
@@ -17,19 +26,18 @@ def add_products(
         product_detail (ProductModel): The product details to be added.
         image (UploadFile|None): The image file to be uploaded.
         id (int): The owner's ID.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Raises:
         HTTPException: If the product already exists with the same name under the same owner.
     """
-    data = (
-        db.query(ProductModel)
-        .filter(
+    result = await db.execute(
+        select(ProductModel).filter(
             ProductModel.product_name == product_detail.product_name,
             ProductModel.owner_id == id,
         )
-        .first()
     )
+    data = result.scalars().first()
     if data:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
@@ -45,17 +53,17 @@ def add_products(
 
         image_path = os.path.join(image_dir, unique_filename)
         with open(image_path, "wb") as f:
-            f.write(image.file.read())
+            f.write(await image.read())
 
         image_path = image_path.replace("\\", "/")
-    return add_product(product_detail, image_path, id, db)
+    return await add_product(product_detail, image_path, id, db)
 
 
-def update_product(
+async def update_product(
     product_detail: UpdateProductDetails,
     image: UploadFile | None,
     product_id: int,
-    db: Session,
+    db: AsyncSession,
 ):
     """
     Updates a product in the database.
@@ -64,12 +72,12 @@ def update_product(
         product_detail (UpdateProductDetails): The product details to be updated.
         image (UploadFile|None): The image file to be uploaded.
         product_id (int): The ID of the product to be updated.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Raises:
         HTTPException: If the product doesn't exists.
     """
-    data = db.query(ProductModel).filter(ProductModel.id == product_id).first()
+    data = await get_product(product_id, db, exact=True)
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product doesn't exists."
@@ -83,20 +91,20 @@ def update_product(
 
         image_path = os.path.join(image_dir, unique_filename)
         with open(image_path, "wb") as f:
-            f.write(image.file.read())
+            f.write(await image.read())
 
         image_path = image_path.replace("\\", "/")
-    return update_product_info(product_detail, image_path, data, db)
+    return await update_product_info(product_detail, image_path, data, db)
 
 
-def delete_product(id: int, user: UserModel, db: Session) -> dict[str, str]:
+async def delete_product(id: int, user: UserModel, db: AsyncSession) -> dict[str, str]:
     """
     Deletes a product from the database.
 
     Args:
         id (int): The ID of the product to be deleted.
         user (UserModel): The user model object.
-        db (Session): The database session.
+        db (AsyncSession): The database session.
 
     Returns:
         dict: A dictionary containing a success message.
@@ -104,13 +112,51 @@ def delete_product(id: int, user: UserModel, db: Session) -> dict[str, str]:
     Raises:
         HTTPException: If the product is not found, raises a 404 Not Found.
     """
-    data = (
-        db.query(ProductModel)
-        .filter(ProductModel.id == id, ProductModel.owner_id == user.id)
-        .first()
+    result = await db.execute(
+        select(ProductModel).filter(
+            ProductModel.id == id, ProductModel.owner_id == user.id
+        )
     )
+    data = result.scalars().first()
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Product not found."
         )
-    return delete_product_info(data, db)
+    return await delete_product_info(data, db)
+
+
+async def bulk_import_products(file: UploadFile, owner_id: int) -> dict:
+    """
+    Imports a seller's products from an uploaded CSV or NDJSON file.
+
+    The upload is read line by line from its spooled file, so large files
+    are not held in memory. See app.core.bulk_import for the file format.
+
+    Args:
+        file (UploadFile): The CSV or NDJSON file.
+        owner_id (int): The seller's ID.
+
+    Returns:
+        dict: The import report: rows read, inserted and rejected, and the rejected rows.
+
+    Raises:
+        HTTPException: If the file type is not supported or the file is not UTF-8.
+    """
+    file_format = import_format(file.filename)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload a .csv, .ndjson or .jsonl file.",
+        )
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        report = await import_products(owner_id, lines, file_format)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="The file is not UTF-8."
+        )
+    finally:
+        lines.detach()
+    if report["inserted"]:
+        listing_cache.invalidate(("all",))
+    return report
@@ -1,19 +1,24 @@
 # Register, login, Update info, Delete User
-from fastapi import HTTPException, status, Response
+from fastapi import BackgroundTasks, HTTPException, status, Response
 from app.models.users import UserModel
-from app.crud.users import add_user
+from app.crud.users import add_user, update_password_hash
 from app.core.security import (
     verify_pwd,
+    verify_and_update_pwd,
     create_access_token,
     create_refresh_token,
     set_access_token,
     set_refresh_token,
+    token_claims,
+    REFRESH_TOKEN_EXPIRE,
 )
+from app.core.revocation import revocations
 from sqlalchemy.exc import OperationalError
 from app.crud.users import delete_users
 from app.schemas.user_schema import UserRegister, UserLogin
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
+from datetime import datetime, timedelta, timezone
 
 
 REFRESH_TOKEN_SECRET = "secretrefresh"
@@ -78,11 +83,13 @@ def login_user(user: UserLogin, response: Response, db: Session) -> dict[str, st
         )
         if not data:
             raise_http(status.HTTP_404_NOT_FOUND, "User doesn't exists.")
-        check_pwd = verify_pwd(user.password, data.password)
+        check_pwd, new_hash = verify_and_update_pwd(user.password, data.password)
         if not check_pwd:
             raise_http(status.HTTP_401_UNAUTHORIZED, "Password incorrect.")
-        token = create_access_token(data=({"sub": str(data.id)}))
-        refresh_token = create_refresh_token(data=({"sub": str(data.id)}))
+        if new_hash:
+            update_password_hash(data, new_hash, db)
+        token = create_access_token(data=token_claims(data))
+        refresh_token = create_refresh_token(data=token_claims(data))
         set_access_token(response, token)
         set_refresh_token(response, refresh_token)
 
@@ -92,42 +99,109 @@ def login_user(user: UserLogin, response: Response, db: Session) -> dict[str, st
         raise_http(status.HTTP_500_INTERNAL_SERVER_ERROR, "Database error.")
 
 
-def refresh_access_token(token: str, response: Response) -> dict[str, str]:
+def refresh_access_token(token: str, response: Response, db: Session) -> dict[str, str]:
     """
     Refreshes the access token using a valid refresh token.
 
     This function decodes the provided refresh token to extract the user ID,
-    and generates a new access token with refreshed expiration time. The new
-    access token is then set in the response cookies.
+    and generates a new access token with refreshed expiration time. The
+    refresh token is rotated: its id is revoked and a new refresh token of
+    the same family is issued. Presenting a rotated refresh token again
+    means it was stolen or replayed, so its whole family is revoked and the
+    user has to log in again. The claims of the new tokens are read from the
+    user's row, so a deleted account can't refresh and a changed role or name
+    is picked up. Both new tokens are set in the response cookies.
 
     Args:
         token (str): The refresh token to be decoded.
-        response (Response): The response object to set the new access token cookie.
+        response (Response): The response object to set the new token cookies.
+        db (Session): The database session holding the revoked tokens.
 
     Returns:
         dict: A dictionary containing a success message indicating the access token has been refreshed.
 
     Raises:
-        HTTPException: If the token payload is invalid or the refresh token is invalid,
-                       a 403 status code is raised with a detail message.
+        HTTPException: If the token payload is invalid, the refresh token is invalid,
+                       revoked or reused, or its user no longer exists, a 403 status
+                       code is raised with a detail message.
     """
 
     try:
         payload = jwt.decode(token, REFRESH_TOKEN_SECRET, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise_http(status.HTTP_403_FORBIDDEN, "Invalid token payload.")
+    except JWTError:
+        raise_http(status.HTTP_403_FORBIDDEN, "Invalid refresh token.")
+    if not all(payload.get(claim) for claim in ("sub", "jti", "fam")):
+        raise_http(status.HTTP_403_FORBIDDEN, "Invalid token payload.")
+    if revocations.is_revoked(db, payload["fam"]):
+        raise_http(status.HTTP_403_FORBIDDEN, "Refresh token revoked.")
+    user = db.get(UserModel, int(payload["sub"]))
+    if user is None or issued_before_revocation(payload, db):
+        raise_http(status.HTTP_403_FORBIDDEN, "User not found.")
+
+    expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+    if not revocations.revoke(db, payload["jti"], "token", expires_at):
+        family_expires_at = datetime.now(timezone.utc) + timedelta(
+            days=REFRESH_TOKEN_EXPIRE
+        )
+        revocations.revoke(db, payload["fam"], "family", family_expires_at)
+        raise_http(status.HTTP_403_FORBIDDEN, "Refresh token reuse detected.")
+
+    claims = token_claims(user)
+    set_access_token(response, create_access_token(claims))
+    set_refresh_token(response, create_refresh_token({**claims, "fam": payload["fam"]}))
+    return {"message": "Access token refreshed"}
+
+
+def issued_before_revocation(payload: dict, db: Session) -> bool:
+    """
+    Check whether a refresh token predates the revocation of all its user's
+    tokens, e.g. because the account was deleted and its id reused since.
+
+    Args:
+        payload (dict): The decoded refresh token.
+        db (Session): The database session holding the revoked tokens.
+
+    Returns:
+        bool: True if the token was issued before the user's tokens were revoked.
+    """
+
+    revoked_at = revocations.revoked_at(db, f"user:{payload['sub']}")
+    if revoked_at is None:
+        return False
+    if revoked_at.tzinfo is None:
+        revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+    # revoked_at may be truncated to the second, give it that second back.
+    cutoff = revoked_at + timedelta(seconds=1)
+    return payload.get("iat", 0) < cutoff.timestamp()
+
 
-        new_access_token = create_access_token({"sub": user_id})
-        set_access_token(response, new_access_token)
+def revoke_refresh_token(token: str | None, db: Session) -> None:
+    """
+    Revokes the family of a refresh token, e.g. on logout.
+
+    Invalid or expired tokens are ignored, they can't be refreshed anyway.
 
-        return {"message": "Access token refreshed"}
+    Args:
+        token (str | None): The refresh token from the request cookies.
+        db (Session): The database session holding the revoked tokens.
+    """
+
+    if not token:
+        return
+    try:
+        payload = jwt.decode(token, REFRESH_TOKEN_SECRET, algorithms=[ALGORITHM])
     except JWTError:
-        raise_http(status.HTTP_403_FORBIDDEN, "Invalid refresh token.")
+        return
+    if payload.get("fam"):
+        expires_at = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE)
+        revocations.revoke(db, payload["fam"], "family", expires_at)
 
 
 def delete_user_account(
-    user: UserLogin, response: Response, db: Session
+    user: UserLogin,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session,
 ) -> dict[str, str]:
     """
     Deletes a user's account from the database.
@@ -135,6 +209,7 @@ def delete_user_account(
     Args:
         user (UserLogin): The user's login credentials containing email and password.
         response (Response): The response object to delete the access token cookie.
+        background_tasks (BackgroundTasks): Runs the image cleanup after the response.
         db (Session): The database session to use for the operation.
 
     Returns:
@@ -151,4 +226,4 @@ def delete_user_account(
     check_pwd = verify_pwd(user.password, user_data.password)
     if not check_pwd:
         raise_http(status.HTTP_400_BAD_REQUEST, "Password Incorrect.")
-    return delete_users(user_data, response, db)
+    return delete_users(user_data, response, background_tasks, db)
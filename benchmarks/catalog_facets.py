@@ -0,0 +1,137 @@
+from app.models import carts, users, orders
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.core.database import Base
+from app.services.catalog_services import (
+    PRICE_EDGES,
+    catalog_filter,
+    product_facets,
+)
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+"""
+Measures the catalog facets on a local SQLite database of a million
+products: the single aggregate pass of GET /products/facets against the
+separate count, price range, in-stock and per-bucket queries a client
+would otherwise need. Both must agree for every filter.
+
+    python -m benchmarks.catalog_facets [products]
+"""
+
+REPEAT = 5
+CHUNK = 50_000
+WORDS = ["red", "blue", "green", "wireless", "leather", "lamp", "shoes", "mug"]
+FILTERS = [
+    ("no filter", None, None, None),
+    ("price 20-500", None, 20, 500),
+    ("search red", "red", None, None),
+    ("search red, price 20-500", "red", 20, 500),
+]
+
+
+async def seed(engine, rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(UserModel),
+            [{"id": 1, "name": "Seller", "email": "s@x", "password": "x"}],
+        )
+        for start in range(0, rows, CHUNK):
+            await conn.execute(
+                insert(ProductModel),
+                [
+                    {
+                        "product_name": f"{WORDS[i % len(WORDS)]} product {i}",
+                        # Spread over several decades of the 1-2-5 buckets.
+                        "price": round(0.5 + (i * 7919) % 200_000 / 100, 2),
+                        "stock": i % 7,
+                        "owner_id": 1,
+                    }
+                    for i in range(start, min(start + CHUNK, rows))
+                ],
+            )
+
+
+async def separate_queries(db: AsyncSession, search, min_price, max_price) -> dict:
+    """The facets as one query per number, the way clients assembled them."""
+
+    async def scalar(*columns, where=None):
+        query = catalog_filter(
+            search, min_price, max_price, "fulltext", select(*columns)
+        )
+        if where is not None:
+            query = query.filter(where)
+        return (await db.execute(query)).one()
+
+    total, low, high = await scalar(
+        func.count(), func.min(ProductModel.price), func.max(ProductModel.price)
+    )
+    (in_stock,) = await scalar(func.count(), where=ProductModel.stock > 0)
+    counts = []
+    for lower, upper in zip((0, *PRICE_EDGES), (*PRICE_EDGES, None)):
+        where = ProductModel.price >= lower
+        if upper is not None:
+            where = where & (ProductModel.price < upper)
+        counts.append((await scalar(func.count(), where=where))[0])
+    used = [i for i, count in enumerate(counts) if count]
+    return {
+        "total": total,
+        "in_stock": in_stock,
+        "min_price": low,
+        "max_price": high,
+        "histogram": counts[used[0] : used[-1] + 1] if used else [],
+    }
+
+
+async def timed(session_factory, facets, *filters) -> tuple:
+    """Return the median milliseconds and the result of `facets(db, *filters)`."""
+    samples = []
+    for _ in range(REPEAT):
+        async with session_factory() as db:
+            start = time.perf_counter()
+            result = await facets(db, *filters)
+            samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[REPEAT // 2], result
+
+
+async def main(rows: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "catalog.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    start = time.perf_counter()
+    await seed(engine, rows)
+    print(f"seeded {rows} products in {time.perf_counter() - start:.1f} s")
+
+    def session_factory():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    async def single_pass(db, search, min_price, max_price):
+        return await product_facets(search, min_price, max_price, db, "fulltext")
+
+    print(f"{'filter':>26} {'matches':>9} {'one pass ms':>12} {'separate ms':>12}")
+    for name, *filters in FILTERS:
+        one_ms, facets = await timed(session_factory, single_pass, *filters)
+        many_ms, expected = await timed(session_factory, separate_queries, *filters)
+        histogram = [bucket["count"] for bucket in facets["price_histogram"]]
+        if {**facets, "histogram": histogram, "price_histogram": None} != {
+            **expected,
+            "price_histogram": None,
+        }:
+            print(f"Facets differ for {name}: {facets} != {expected}!")
+            sys.exit(1)
+        print(f"{name:>26} {facets['total']:>9} {one_ms:>12.1f} {many_ms:>12.1f}")
+    await engine.dispose()
+
+
+def run():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    asyncio.run(main(rows))
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,117 @@
+from app.models import carts, users, orders
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.core.database import Base
+from app.schemas.product_schema import ProductOut
+from app.services.catalog_services import list_products
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from typing import List
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+"""
+Compares the ORM and the Core paths of GET /products/all on a local SQLite
+database: checks that both produce the same JSON, then reports CPU time and
+allocations per page.
+
+    python -m benchmarks.catalog_listing [rows_per_page] [pages]
+"""
+
+ROWS = 2000
+listing_adapter = TypeAdapter(List[ProductOut])
+
+
+async def orm_page(db: AsyncSession, limit: int, offset: int) -> bytes:
+    """The listing as it was served before: ORM instances through ProductOut."""
+    result = await db.execute(
+        select(ProductModel).order_by(ProductModel.id).offset(offset).limit(limit)
+    )
+    products = listing_adapter.validate_python(
+        result.scalars().all(), from_attributes=True
+    )
+    return JSONResponse(content=listing_adapter.dump_python(products, mode="json")).body
+
+
+async def core_page(db: AsyncSession, limit: int, offset: int) -> bytes:
+    response = await list_products(None, None, None, None, limit, offset, db)
+    return response.body
+
+
+async def measure(page, session_factory, limit: int, pages: int) -> dict:
+    """
+    Serve `pages` pages with a fresh session each, like separate requests.
+
+    Returns:
+        dict: CPU milliseconds and peak traced allocation per page.
+    """
+    offsets = [(i * limit) % (ROWS - limit) for i in range(pages)]
+    start = time.process_time()
+    for offset in offsets:
+        async with session_factory() as db:
+            await page(db, limit, offset)
+    cpu = time.process_time() - start
+
+    tracemalloc.start()
+    async with session_factory() as db:
+        await page(db, limit, 0)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "cpu_ms_per_page": round(cpu / pages * 1000, 3),
+        "peak_alloc_kib_per_page": round(peak / 1024, 1),
+    }
+
+
+async def main(limit: int, pages: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "catalog.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as db:
+        db.add(UserModel(id=1, name="Seller", email="s@x", password="x", role="admin"))
+        db.add_all(
+            ProductModel(
+                product_name=f"Product {i}",
+                price=round(1 + i * 0.37, 2),
+                stock=i % 50,
+                owner_id=1,
+                description=None if i % 3 else f"Description {i}",
+                image_path=None if i % 2 else f"images/upload/{i}.png",
+            )
+            for i in range(ROWS)
+        )
+        await db.commit()
+
+    def session_factory():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    async with session_factory() as db:
+        orm_body = await orm_page(db, limit, 0)
+    async with session_factory() as db:
+        core_body = await core_page(db, limit, 0)
+    if orm_body != core_body:
+        print("Responses differ!")
+        sys.exit(1)
+    print(f"Identical JSON for a {limit}-row page ({len(core_body)} bytes).")
+
+    for name, page in (("orm", orm_page), ("core", core_page)):
+        await measure(page, session_factory, limit, max(pages // 10, 1))
+        print(name, await measure(page, session_factory, limit, pages))
+    await engine.dispose()
+
+
+def run():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    asyncio.run(main(limit, pages))
+
+
+if __name__ == "__main__":
+    run()
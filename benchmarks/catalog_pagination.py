@@ -0,0 +1,123 @@
+from app.models import carts, users, orders
+from app.core.cache import listing_cache
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.core.database import Base
+from app.services.catalog_services import (
+    NEXT_CURSOR_HEADER,
+    encode_cursor,
+    list_products,
+    listing_query,
+)
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+"""
+Compares offset and cursor pagination of GET /products/all on a local SQLite
+database, sorted by price, at increasing page depths. Both modes must return
+the same page; the latency of the offset mode grows with the depth while the
+cursor mode stays flat.
+
+    python -m benchmarks.catalog_pagination [rows_per_page] [deepest_page]
+"""
+
+SORT_BY = "price_asc"
+REPEAT = 20
+
+
+async def seed(engine, rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(
+            insert(UserModel),
+            [
+                {
+                    "id": 1,
+                    "name": "Seller",
+                    "email": "s@x",
+                    "password": "x",
+                    "role": "admin",
+                }
+            ],
+        )
+        await conn.execute(
+            insert(ProductModel),
+            [
+                {
+                    "product_name": f"Product {i}",
+                    # Many equal prices, so the id tiebreak matters.
+                    "price": 1 + (i * 7919) % 5000 / 100,
+                    "stock": i % 50,
+                    "owner_id": 1,
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+async def cursor_before(db: AsyncSession, limit: int, page: int) -> str | None:
+    """The cursor a client holds after reading the pages before `page`."""
+    if page == 1:
+        return None
+    query = listing_query(None, None, None, SORT_BY)
+    result = await db.execute(query.offset((page - 1) * limit - 1).limit(1))
+    return encode_cursor(SORT_BY, result.one())
+
+
+async def timed(session_factory, limit: int, offset: int, cursor) -> tuple:
+    """Return the median milliseconds per page and the page served."""
+    samples = []
+    for _ in range(REPEAT):
+        # Time the database, not the listing cache.
+        listing_cache.clear()
+        async with session_factory() as db:
+            start = time.perf_counter()
+            response = await list_products(
+                None, None, None, SORT_BY, limit, offset, db, cursor
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[REPEAT // 2], response
+
+
+async def main(limit: int, deepest: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "catalog.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    await seed(engine, limit * (deepest + 1))
+
+    def session_factory():
+        return AsyncSession(engine, expire_on_commit=False)
+
+    print(f"{'page':>8} {'offset ms':>10} {'cursor ms':>10}")
+    page = 1
+    while page <= deepest:
+        async with session_factory() as db:
+            cursor = await cursor_before(db, limit, page)
+        offset_ms, by_offset = await timed(
+            session_factory, limit, (page - 1) * limit, None
+        )
+        cursor_ms, by_cursor = await timed(session_factory, limit, 0, cursor)
+        if json.loads(by_offset.body) != json.loads(by_cursor.body):
+            print(f"Pages differ at page {page}!")
+            sys.exit(1)
+        if NEXT_CURSOR_HEADER.lower() not in by_cursor.headers:
+            print(f"No next cursor at page {page}!")
+            sys.exit(1)
+        print(f"{page:>8} {offset_ms:>10.3f} {cursor_ms:>10.3f}")
+        page *= 10
+    await engine.dispose()
+
+
+def run():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    deepest = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    asyncio.run(main(limit, deepest))
+
+
+if __name__ == "__main__":
+    run()
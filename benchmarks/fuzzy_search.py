@@ -0,0 +1,155 @@
+from app.core.database import engine
+from app.core.trigram import FUZZY_THRESHOLD
+from app.models import carts, orders, revoked_tokens
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.services.catalog_services import listing_query
+from sqlalchemy import Select, insert, text
+from sqlalchemy.orm import with_loader_criteria
+import sys
+import time
+import uuid
+
+"""
+Measures fuzzy product search on PostgreSQL with a million products.
+
+Seeds the products inside a transaction that is rolled back, so it can run
+against any database with the migrations applied (the trigram index is
+created in the transaction if it is missing). Misspelled searches are timed
+in fuzzy mode and, for comparison, in substring mode; the run fails if fuzzy
+mode scans the whole table or its 95th percentile exceeds the budget.
+
+    python -m benchmarks.fuzzy_search [budget_ms] [products]
+"""
+
+REPEAT = 5
+ADJECTIVES = [
+    "red", "blue", "green", "black", "white", "silver", "golden", "wooden",
+    "leather", "cotton", "wireless", "portable", "compact", "vintage",
+    "classic", "modern", "organic", "waterproof", "electric", "premium",
+]  # fmt: skip
+NOUNS = [
+    "running shoes", "desk lamp", "backpack", "headphones", "keyboard",
+    "coffee mug", "water bottle", "sunglasses", "wallet", "notebook",
+    "umbrella", "blender", "toaster", "kettle", "pillow", "blanket",
+    "jacket", "sneakers", "watch", "bracelet", "necklace", "speaker",
+    "charger", "monitor", "mouse pad", "office chair", "bookshelf",
+    "frying pan", "cutting board", "yoga mat", "dumbbell", "bicycle",
+    "helmet", "tent", "sleeping bag", "flashlight", "camera", "tripod",
+    "guitar", "violin", "telescope", "microscope", "printer", "scanner",
+    "router", "tablet", "smartphone", "laptop", "drone", "vacuum cleaner",
+]  # fmt: skip
+SEARCHES = [
+    "runing shoes", "hedphones", "keybaord", "wireles speaker", "sunglases",
+    "laptp", "vacum cleaner", "bycicle helmet", "telescop", "blendr",
+]  # fmt: skip
+
+
+def sql_array(words: list[str]) -> str:
+    return "ARRAY[" + ", ".join(f"'{word}'" for word in words) + "]"
+
+
+def seed(conn, rows: int) -> None:
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_products_live_name_trgm ON products "
+            "USING gin (product_name gin_trgm_ops) WHERE deleted_at IS NULL"
+        )
+    )
+    owner_id = conn.execute(
+        insert(UserModel).returning(UserModel.id),
+        {
+            "name": "Fuzzy",
+            "email": f"fuzzy-{uuid.uuid4().hex[:8]}@example.com",
+            "password": "x",
+            "role": "admin",
+        },
+    ).scalar_one()
+    conn.execute(
+        text(
+            "INSERT INTO products (product_name, price, stock, owner_id) "
+            f"SELECT ({sql_array(ADJECTIVES)})[1 + i % {len(ADJECTIVES)}] || ' ' || "
+            f"({sql_array(NOUNS)})[1 + (i / {len(ADJECTIVES)}) % {len(NOUNS)}] "
+            "|| ' ' || i, 1 + i % 1000, 10, :owner_id "
+            "FROM generate_series(1, :rows) AS i"
+        ),
+        {"owner_id": owner_id, "rows": rows},
+    )
+    conn.execute(text("ANALYZE products"))
+
+
+def live(statement: Select) -> Select:
+    """Add the soft-delete criterion the session adds to every product query."""
+    return statement.options(
+        with_loader_criteria(
+            ProductModel, ProductModel.deleted_at.is_(None), include_aliases=True
+        )
+    )
+
+
+def full_scans(conn, statement: Select) -> list[str]:
+    sql = str(statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+    nodes, scans = [plan[0]["Plan"]], []
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def measure(conn, search_mode: str) -> list[float]:
+    samples = []
+    for search in SEARCHES:
+        query = live(listing_query(search, None, None, None, search_mode).limit(10))
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            conn.execute(query).all()
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+    if engine.dialect.name != "postgresql":
+        print("Fuzzy search benchmark needs PostgreSQL; set DATABASE_URL.")
+        sys.exit(1)
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            start = time.perf_counter()
+            seed(conn, rows)
+            print(f"seeded {rows} products in {time.perf_counter() - start:.1f} s")
+            print(f"word similarity threshold {FUZZY_THRESHOLD}")
+
+            query = listing_query(SEARCHES[0], None, None, None, "fuzzy")
+            scans = full_scans(conn, live(query.limit(10)))
+
+            results = {}
+            for search_mode in ("fuzzy", "substring"):
+                p50, p95 = percentiles(measure(conn, search_mode))
+                results[search_mode] = p95
+                print(f"{search_mode:10} p50 {p50:8.2f} ms  p95 {p95:8.2f} ms")
+        finally:
+            trans.rollback()
+
+    if scans:
+        print(f"Fuzzy search reads whole tables: {'; '.join(scans)}!")
+        sys.exit(1)
+    if results["fuzzy"] > budget:
+        print(f"Fuzzy search p95 exceeds the {budget:.0f} ms budget!")
+        sys.exit(1)
+    print(f"Fuzzy search p95 within the {budget:.0f} ms budget.")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+from app.core.suggest import SuggestIndex
+import random
+import sys
+import time
+
+"""
+Measures the product name suggestion index: build time for a catalog of
+generated names, and the time per lookup for prefixes typed one letter at
+a time, as a search box sends them.
+
+    python -m benchmarks.suggest_lookup [products] [lookups]
+"""
+
+WORDS = [
+    "red", "blue", "green", "black", "wireless", "portable", "vintage",
+    "leather", "running", "shoes", "desk", "lamp", "backpack", "headphones",
+    "keyboard", "coffee", "mug", "bottle", "sunglasses", "wallet", "kettle",
+    "jacket", "watch", "speaker", "charger", "monitor", "chair", "camera",
+]  # fmt: skip
+
+
+def run():
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    rng = random.Random(1)
+    names = [
+        (i, " ".join(rng.sample(WORDS, 3)) + f" {i}") for i in range(1, products + 1)
+    ]
+
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.rebuild(names)
+    entries = len(index.starts) + len(index.words)
+    print(f"built {entries} entries in {time.perf_counter() - start:.2f} s")
+
+    prefixes = []
+    while len(prefixes) < lookups:
+        word = rng.choice(WORDS)
+        prefixes.extend(word[:n] for n in range(1, len(word) + 1))
+    prefixes = prefixes[:lookups]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        index.suggest(prefix, 5)
+    elapsed = (time.perf_counter() - start) / lookups * 1e6
+    print(f"suggest: {elapsed:8.2f} us/lookup")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(products + i + 1, "brand new product")
+    print(f"add:     {(time.perf_counter() - start) * 1000:8.2f} us/product")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+# The app reads its configuration at import time, so point it at a scratch
+# SQLite database before anything from `app` is imported.
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["DATABASE_SHARD_URLS"] = ""
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["PRODUCT_PURGE_ENABLED"] = "false"
+os.environ["DB_QUERY_BUDGET_STRICT"] = "true"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import Base, engine
+from app.main import app
+
+ADMIN = {"name": "Seller", "email": "seller@example.com", "password": "secret1"}
+BUYER = {"name": "Buyer", "email": "buyer@example.com", "password": "secret1"}
+PRODUCTS = 6
+
+
+@pytest.fixture(scope="session")
+def client():
+    """A client for the app on a database with a seller's products."""
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as client:
+        client.post("/admin/register", json={**ADMIN, "role": "admin"})
+        client.post("/admin/login", json=ADMIN)
+        for i in range(1, PRODUCTS + 1):
+            client.post(
+                "/products/add",
+                data={"product_name": f"Widget {i}", "price": str(i), "stock": "50"},
+            )
+        client.cookies.clear()
+        client.post("/users/register", json={**BUYER, "role": ""})
+        yield client
+
+
+@pytest.fixture
+def buyer(client):
+    """The client, logged in as the buyer."""
+    client.cookies.clear()
+    client.post("/users/login", json=BUYER)
+    return client
@@ -0,0 +1,44 @@
+import pytest
+from app.core import etag
+from tests.conftest import ADMIN
+
+
+@pytest.fixture
+def admin(client):
+    client.cookies.clear()
+    client.post("/admin/login", json=ADMIN)
+    return client
+
+
+def test_not_modified_until_a_product_changes(admin):
+    first = admin.get("/products/all")
+    tag = first.headers["ETag"]
+    assert admin.get("/products/all", headers={"If-None-Match": tag}).status_code == 304
+
+    admin.put("/products/update/1", data={"stock": "40"})
+    changed = admin.get("/products/all", headers={"If-None-Match": tag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != tag
+
+
+def test_failed_bump_drops_the_etag(admin, monkeypatch):
+    tag = admin.get("/products/all").headers["ETag"]
+    bump_versions = etag.bump_versions
+
+    def fail(bind, scopes):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(etag, "bump_versions", fail)
+    admin.put("/products/update/1", data={"stock": "41"})
+    response = admin.get("/products/all", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"] == etag.NO_STORE_CACHE_CONTROL
+
+    # The next bump catches up with the scopes that were missed.
+    monkeypatch.setattr(etag, "bump_versions", bump_versions)
+    admin.put("/products/update/1", data={"stock": "42"})
+    assert not etag.unbumped_scopes
+    response = admin.get("/products/all", headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
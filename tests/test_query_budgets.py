@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import select
+from app.core import query_stats
+from app.core.query_stats import QueryBudgetExceeded, set_query_budget
+from app.models.products import ProductModel
+from app.routes import cart_route
+from tests.conftest import PRODUCTS
+
+# Statements each endpoint may run. These endpoints must not run more
+# queries when there are more rows; raising a limit needs a reason.
+QUERY_BUDGETS = {
+    "GET /products/all": 3,
+    "GET /products/facets": 3,
+    "GET /cart/get": 6,
+    "GET /order/all": 3,
+    "POST /order/add/{product_id}": 8,
+}
+
+
+@pytest.fixture(autouse=True)
+def budgets(monkeypatch):
+    monkeypatch.setattr(query_stats, "QUERY_BUDGET_STRICT", True)
+    monkeypatch.setattr(query_stats, "QUERY_BUDGETS", {})
+    for endpoint, limit in QUERY_BUDGETS.items():
+        set_query_budget(endpoint, limit)
+
+
+@pytest.fixture
+def full_cart(buyer):
+    for product_id in range(1, PRODUCTS + 1):
+        buyer.post(f"/cart/add/{product_id}", json={"quantity": 1})
+    yield buyer
+    for product_id in range(1, PRODUCTS + 1):
+        buyer.delete(f"/cart/delete/{product_id}")
+
+
+def test_catalog_within_budget(client):
+    assert client.get("/products/all", params={"limit": 50}).status_code == 200
+    assert client.get("/products/facets", params={"max_price": 3}).status_code == 200
+
+
+def test_cart_within_budget(full_cart):
+    response = full_cart.get("/cart/get")
+    assert response.status_code == 200
+    assert len(response.json()["cart_items"]) == PRODUCTS
+
+
+def test_orders_within_budget(buyer):
+    for product_id in range(1, PRODUCTS + 1):
+        assert (
+            buyer.post(f"/order/add/{product_id}", json={"quantity": 1}).status_code
+            == 200
+        )
+    response = buyer.get("/order/all")
+    assert response.status_code == 200
+    assert len(response.json()) >= PRODUCTS
+
+
+def test_n_plus_one_exceeds_budget(full_cart, monkeypatch):
+    cart_details = cart_route.cart_details
+
+    async def cart_details_per_row(user, db):
+        items = await cart_details(user, db)
+        # The regression: one more query per cart row.
+        for item in items:
+            await db.scalar(
+                select(ProductModel.stock).where(ProductModel.id == item.product_id)
+            )
+        return items
+
+    monkeypatch.setattr(cart_route, "cart_details", cart_details_per_row)
+    with pytest.raises(QueryBudgetExceeded):
+        full_cart.get("/cart/get")
+
+
+def test_budget_is_per_endpoint(full_cart):
+    set_query_budget("GET /cart/get", 1)
+    with pytest.raises(QueryBudgetExceeded):
+        full_cart.get("/cart/get")
+    assert full_cart.get("/products/all").status_code == 200
@@ -0,0 +1,199 @@
+import pytest
+from app.models.carts import CartModel
+from app.models.orders import OrderModel, OrderStatus
+from app.models.products import ProductModel
+from app.models.users import UserModel
+from app.core.database import engine
+from app.services.catalog_services import listing_query, keyset_filter
+from sqlalchemy import Select, insert, select
+from sqlalchemy.orm import with_loader_criteria
+from sqlalchemy.engine import Connection
+from datetime import datetime, timezone
+import uuid
+
+# The hot queries of the services must not scan whole tables. The sample rows
+# are seeded inside a transaction that is rolled back after the module.
+
+SEED_USERS = 200
+SEED_PRODUCTS = 20000
+SEED_CARTS = 5000
+SEED_ORDERS = 5000
+
+
+def live(statement: Select) -> Select:
+    """Add the soft-delete criterion the session adds to every product query."""
+    return statement.options(
+        with_loader_criteria(
+            ProductModel, ProductModel.deleted_at.is_(None), include_aliases=True
+        )
+    )
+
+
+def hot_queries(user_id: int, product_id: int) -> dict[str, Select]:
+    """
+    Build the statements the services run on every request, with sample values.
+
+    Args:
+        user_id (int): A seeded user id.
+        product_id (int): A seeded product id.
+
+    Returns:
+        dict[str, Select]: Statements keyed by a short description.
+    """
+    return {
+        "product by owner and name": live(
+            select(ProductModel).filter(
+                ProductModel.product_name == "Product 1",
+                ProductModel.owner_id == user_id,
+            )
+        ),
+        "products by owner": live(
+            select(ProductModel).filter(ProductModel.owner_id == user_id)
+        ),
+        "catalog sorted by price": live(
+            listing_query(None, None, None, "price_asc").limit(10)
+        ),
+        "catalog price range": live(listing_query(None, 10, 12, None).limit(10)),
+        "catalog full-text search": live(
+            listing_query("Product 1", None, None, None, "fulltext").limit(10)
+        ),
+        "catalog page after cursor": live(
+            keyset_filter(
+                "price_asc", [500.0, 1], listing_query(None, None, None, "price_asc")
+            ).limit(10)
+        ),
+        "deleted products to purge": select(ProductModel.id)
+        .where(ProductModel.deleted_at < datetime.now(timezone.utc))
+        .order_by(ProductModel.deleted_at)
+        .limit(500),
+        "cart item": select(CartModel).filter(
+            CartModel.owner_id == user_id, CartModel.product_id == product_id
+        ),
+        "cart of user": select(CartModel).filter(CartModel.owner_id == user_id),
+        "orders of user": select(OrderModel).filter(OrderModel.owner_id == user_id),
+        "orders of product": select(OrderModel).filter(
+            OrderModel.product_id == product_id
+        ),
+    }
+
+
+def seed(conn: Connection) -> tuple[int, int]:
+    """
+    Insert the sample rows and refresh the planner statistics.
+
+    Args:
+        conn (Connection): The connection, inside the transaction to roll back.
+
+    Returns:
+        tuple[int, int]: A seeded user id and product id to query for.
+    """
+    tag = uuid.uuid4().hex[:8]
+    user_ids = (
+        conn.execute(
+            insert(UserModel).returning(UserModel.id),
+            [
+                {
+                    "name": f"Plan {i}",
+                    "email": f"plan-{tag}-{i}@example.com",
+                    "password": "x",
+                    "role": "admin",
+                }
+                for i in range(SEED_USERS)
+            ],
+        )
+        .scalars()
+        .all()
+    )
+    product_ids = (
+        conn.execute(
+            insert(ProductModel).returning(ProductModel.id),
+            [
+                {
+                    "product_name": f"Product {i}",
+                    "price": 1 + (i * 7919) % 100000 / 100,
+                    "stock": 100,
+                    "owner_id": user_ids[i % SEED_USERS],
+                }
+                for i in range(SEED_PRODUCTS)
+            ],
+        )
+        .scalars()
+        .all()
+    )
+    conn.execute(
+        insert(CartModel),
+        [
+            {
+                "owner_id": user_ids[i % SEED_USERS],
+                "product_id": product_ids[i],
+                "quantity": 1,
+            }
+            for i in range(SEED_CARTS)
+        ],
+    )
+    conn.execute(
+        insert(OrderModel),
+        [
+            {
+                "product_name": f"Product {i}",
+                "quantity": 1,
+                "price": 1.0,
+                "seller_name": "Plan",
+                "owner_id": user_ids[i % SEED_USERS],
+                "product_id": product_ids[i],
+                "status": OrderStatus.PENDING,
+            }
+            for i in range(SEED_ORDERS)
+        ],
+    )
+    conn.exec_driver_sql("ANALYZE")
+    return user_ids[0], product_ids[0]
+
+
+def full_scans(conn: Connection, statement: Select) -> list[str]:
+    """
+    EXPLAIN a statement and return the tables it reads with a full scan.
+
+    Args:
+        conn (Connection): The connection holding the seeded data.
+        statement (Select): The statement to check.
+
+    Returns:
+        list[str]: "Seq Scan" (PostgreSQL) or "SCAN" (SQLite) plan lines. On
+        SQLite a MATCH on the FTS5 table is an index lookup, not a scan.
+    """
+    sql = str(statement.compile(conn.engine, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+        nodes, scans = [plan[0]["Plan"]], []
+        while nodes:
+            node = nodes.pop()
+            if node["Node Type"] == "Seq Scan":
+                scans.append(f"Seq Scan on {node['Relation Name']}")
+            nodes.extend(node.get("Plans", []))
+        return scans
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()
+    return [
+        row[-1]
+        for row in rows
+        if row[-1].startswith("SCAN ")
+        and " USING " not in row[-1]
+        and " VIRTUAL TABLE INDEX " not in row[-1]
+    ]
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    """A connection holding the sample rows, with a user id and a product id."""
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            yield conn, *seed(conn)
+        finally:
+            transaction.rollback()
+
+
+@pytest.mark.parametrize("name", list(hot_queries(1, 1)))
+def test_hot_query_uses_indexes(seeded, name):
+    conn, user_id, product_id = seeded
+    assert full_scans(conn, hot_queries(user_id, product_id)[name]) == []
@@ -0,0 +1,40 @@
+import ipaddress
+import pytest
+from starlette.requests import Request
+from app.core import rate_limit
+from app.core.rate_limit import client_address
+
+
+def request(peer: str, *forwarded: str) -> Request:
+    headers = [(b"x-forwarded-for", value.encode()) for value in forwarded]
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.fixture(autouse=True)
+def trusted_proxies(monkeypatch):
+    monkeypatch.setattr(
+        rate_limit,
+        "TRUSTED_PROXIES",
+        [ipaddress.ip_network("10.0.0.0/8"), ipaddress.ip_network("127.0.0.1")],
+    )
+
+
+def test_untrusted_peer_ignores_header():
+    assert client_address(request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_last_untrusted_hop_is_the_client():
+    # The client made up the first hop; the proxies appended the others.
+    forwarded = "1.2.3.4, 198.51.100.1, 10.0.0.5"
+    assert client_address(request("127.0.0.1", forwarded)) == "198.51.100.1"
+
+
+def test_repeated_headers_are_joined():
+    assert client_address(request("10.0.0.2", "1.2.3.4", "198.51.100.1")) == (
+        "198.51.100.1"
+    )
+
+
+def test_only_proxies_uses_the_first_hop():
+    assert client_address(request("10.0.0.2", "10.0.0.9, 10.0.0.5")) == "10.0.0.9"
+    assert client_address(request("10.0.0.2")) == "10.0.0.2"
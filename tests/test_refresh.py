@@ -0,0 +1,40 @@
+from jose import jwt
+from app.services.user_services import REFRESH_TOKEN_SECRET, ALGORITHM
+
+LEAVER = {"name": "Leaver", "email": "leaver@example.com", "password": "secret1"}
+
+
+def login(client, user):
+    client.cookies.clear()
+    client.post("/users/register", json={**user, "role": ""})
+    response = client.post("/users/login", json=user)
+    assert response.status_code == 200
+    return response.cookies["refresh_token"]
+
+
+def refresh(client, token):
+    client.cookies.clear()
+    client.cookies.set("refresh_token", token)
+    return client.post("/users/refresh-token")
+
+
+def test_refresh_rotates_the_token(client):
+    token = login(client, LEAVER)
+    response = refresh(client, token)
+    assert response.status_code == 200
+    rotated = response.cookies["refresh_token"]
+    assert refresh(client, token).status_code == 403
+    assert refresh(client, rotated).status_code == 403
+
+
+def test_deleted_user_cannot_refresh(client):
+    token = login(client, LEAVER)
+    user_id = jwt.decode(token, REFRESH_TOKEN_SECRET, algorithms=[ALGORITHM])["sub"]
+    deleted = client.request("DELETE", f"/users/delete/{user_id}", json=LEAVER)
+    assert deleted.status_code == 200
+
+    assert refresh(client, token).status_code == 403
+
+    # The account is registered again, possibly under the same id.
+    login(client, LEAVER)
+    assert refresh(client, token).status_code == 403
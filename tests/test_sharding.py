@@ -0,0 +1,82 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+# The app reads DATABASE_SHARD_URLS at import time, so the sharded app runs
+# in its own interpreter: this file, run as a script.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SELLERS = [
+    # User 1 sells on shard 1, user 2 on the home shard.
+    {"name": "Seller One", "email": "one@example.com", "password": "secret1"},
+    {"name": "Seller Two", "email": "two@example.com", "password": "secret1"},
+]
+BUYER = {"name": "Buyer", "email": "buyer@example.com", "password": "secret1"}
+
+
+def test_two_sqlite_shards():
+    directory = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{directory}/home.db",
+        "DATABASE_SHARD_URLS": f"sqlite:///{directory}/shard1.db",
+        "DATABASE_REPLICA_URLS": "",
+        "PRODUCT_PURGE_ENABLED": "false",
+        "PYTHONPATH": ROOT,
+    }
+    result = subprocess.run(
+        [sys.executable, __file__], env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    def products(name):
+        with sqlite3.connect(os.path.join(directory, name)) as conn:
+            return conn.execute("SELECT id, owner_id FROM products").fetchall()
+
+    # Ids are interleaved: shard 1 allocates even ids, the home shard odd ones.
+    assert products("shard1.db") == [(2, 1)]
+    assert products("home.db") == [(1, 2)]
+
+
+def scenario():
+    from fastapi.testclient import TestClient
+    from app.core import create_tables
+    from app.main import app
+
+    create_tables.run()
+    # Running it again must not touch the prepared shards.
+    create_tables.run()
+    with TestClient(app) as client:
+        for i, seller in enumerate(SELLERS, start=1):
+            client.cookies.clear()
+            client.post("/admin/register", json={**seller, "role": "admin"})
+            client.post("/admin/login", json=seller)
+            response = client.post(
+                "/products/add",
+                data={"product_name": f"Lamp {i}", "price": str(10 * i), "stock": "5"},
+            )
+            assert response.status_code == 200, response.text
+
+        client.cookies.clear()
+        client.post("/users/register", json={**BUYER, "role": ""})
+        client.post("/users/login", json=BUYER)
+        for product_id in (1, 2):
+            response = client.post(f"/cart/add/{product_id}", json={"quantity": 2})
+            assert response.status_code == 200, response.text
+        cart = client.get("/cart/get").json()
+        assert cart["cart_total_price"] == 2 * 10 + 2 * 20, cart
+
+        response = client.post("/cart/order")
+        assert response.status_code == 200, response.text
+        orders = client.get("/order/all").json()
+        assert sorted(order["product_name"] for order in orders) == [
+            "Lamp 1",
+            "Lamp 2",
+        ], orders
+        catalog = client.get("/products/all").json()
+        assert {product["stock"] for product in catalog} == {3}, catalog
+
+
+if __name__ == "__main__":
+    scenario()